@@ -0,0 +1,203 @@
+"""관리용 CLI
+
+사용법 (backend 디렉토리에서):
+    python -m app.cli drain-outbox
+    python -m app.cli reconcile [--dry-run]
+    python -m app.cli backfill-chunks [--drop-legacy]
+    python -m app.cli rebuild-tags [--skip-vectors]
+    python -m app.cli batch-export {summarize,embed} [--all] [--limit N]
+    python -m app.cli batch-submit JOB_ID [--transport openai|local]
+    python -m app.cli batch-status JOB_ID [--wait]
+    python -m app.cli batch-apply JOB_ID
+    python -m app.cli export OUTPUT [--format ndjson|columnar] [--user-id N] [--no-vectors]
+    python -m app.cli restore INPUT
+
+VECTOR_BACKEND=local이면 벡터 저장소를 쓰는 명령(drain-outbox, reconcile, backfill-chunks --drop-legacy,
+batch-apply, export, restore)은 API 서버가 꺼져 있을 때만 실행할 수 있다.
+로컬 인덱스는 한 프로세스만 열 수 있어서, 서버가 실행 중이면 잠금 오류로 종료된다.
+서버 실행 중에는 rebuild-tags / backfill-chunks처럼 outbox에 작업만 쌓는 명령을 쓰고 서버 작업자가 반영하게 한다.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+from app.db.session import SessionLocal
+from app.services import batch_jobs, snapshot
+from app.services.outbox import drain_outbox, queue_indexed_notes, queue_unindexed_notes, reconcile
+from app.services.local_index import IndexLockedError
+from app.services.tags import rebuild_tag_index
+from app.services.vector_store import vector_store
+
+async def cmd_drain_outbox(args) -> None:
+    """outbox에 쌓인 작업을 모두 처리"""
+    total = 0
+    with SessionLocal() as db:
+        while True:
+            processed = await drain_outbox(db, batch_size=args.batch_size)
+            total += processed
+            if not processed:
+                break
+    print(f"Processed {total} outbox entries")
+
+async def cmd_reconcile(args) -> None:
+    """DB와 벡터 저장소 차이 검사/복구"""
+    with SessionLocal() as db:
+        report = await reconcile(db, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+    if not args.dry_run and report["notes_to_reindex"]:
+        print("Re-index jobs queued; run drain-outbox or let the API worker process them.")
+
+async def cmd_backfill_chunks(args) -> None:
+    """청크 도입 이전 노트를 NoteChunk 컬렉션에 다시 임베딩 (이전 NoteVector 벡터는 재사용 불가)"""
+    with SessionLocal() as db:
+        queued = queue_unindexed_notes(db)
+    print(f"Queued {queued} notes without chunks; run drain-outbox or let the API worker process them.")
+    if args.drop_legacy:
+        if not vector_store.drop_legacy_collection():
+            print("Legacy collection was not deleted (not connected to Weaviate)")
+
+async def cmd_rebuild_tags(args) -> None:
+    """Note.tags에서 태그 인덱스(note_tags) 재구성"""
+    with SessionLocal() as db:
+        processed = rebuild_tag_index(db, batch_size=args.batch_size)
+        print(f"Rebuilt tag index for {processed} notes")
+        if not args.skip_vectors:
+            # 청크에 저장된 태그(검색 사전 필터용)도 갱신 - 임베딩은 재사용
+            queued = queue_indexed_notes(db)
+            print(f"Queued {queued} notes to refresh chunk tags; run drain-outbox or let the API worker process them.")
+
+async def cmd_batch_export(args) -> None:
+    """처리할 노트를 Batch API 형식 JSONL로 내보내기"""
+    with SessionLocal() as db:
+        manifest = batch_jobs.export_job(db, args.kind, everything=args.all, limit=args.limit)
+    print(f"Exported {manifest['requests']} requests for {manifest['notes']} notes "
+          f"in {len(manifest['files'])} file(s): job {manifest['id']}")
+
+async def cmd_batch_submit(args) -> None:
+    """내보낸 파일을 배치 작업으로 제출"""
+    manifest = await batch_jobs.submit_job(args.job_id, args.transport)
+    print(json.dumps(manifest["files"], indent=2))
+
+async def cmd_batch_status(args) -> None:
+    """배치 상태 조회 (--wait: 모두 끝날 때까지 주기적으로 조회)"""
+    while True:
+        manifest = await batch_jobs.poll_job(args.job_id)
+        if not args.wait or batch_jobs.is_finished(manifest):
+            break
+        await asyncio.sleep(args.interval)
+    print(json.dumps(manifest["files"], indent=2))
+
+async def cmd_batch_apply(args) -> None:
+    """배치 결과를 노트/벡터 저장소에 반영"""
+    with SessionLocal() as db:
+        report = await batch_jobs.apply_job(db, args.job_id)
+    print(json.dumps(report, indent=2))
+
+def _open(path: str, mode: str):
+    """.gz로 끝나면 gzip으로 읽고 쓰기"""
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+async def cmd_export(args) -> None:
+    """노트/연결/벡터 스냅샷을 파일로 내보내기"""
+    lines = 0
+    with _open(args.output, "wb") as f:
+        async for line in snapshot.iter_snapshot(
+            args.user_id, args.format, include_vectors=not args.no_vectors, batch_size=args.batch_size
+        ):
+            f.write(line)
+            lines += 1
+    print(f"Wrote {lines} lines to {args.output}")
+
+async def cmd_restore(args) -> None:
+    """스냅샷에서 노트와 벡터 복원 (임베딩 API 호출 없음)"""
+    with SessionLocal() as db, _open(args.input, "rb") as f:
+        report = await snapshot.restore_snapshot(db, f, batch_size=args.batch_size)
+    print(json.dumps(report, indent=2))
+    if report["reembed_notes"]:
+        print("Notes without reusable vectors were queued; run drain-outbox or let the API worker process them.")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="BrainS(x)LM admin commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    drain = commands.add_parser("drain-outbox", help="process pending vector outbox entries")
+    drain.add_argument("--batch-size", type=int, default=None)
+    drain.set_defaults(handler=cmd_drain_outbox)
+
+    check = commands.add_parser("reconcile", help="diff DB chunks against the vector store and repair drift")
+    check.add_argument("--dry-run", action="store_true", help="only report differences")
+    check.set_defaults(handler=cmd_reconcile)
+
+    backfill = commands.add_parser("backfill-chunks", help="queue notes indexed before chunking for re-embedding")
+    backfill.add_argument("--drop-legacy", action="store_true", help="delete the old NoteVector collection")
+    backfill.set_defaults(handler=cmd_backfill_chunks)
+
+    tags = commands.add_parser("rebuild-tags", help="rebuild the tag index from stored note tags")
+    tags.add_argument("--batch-size", type=int, default=500)
+    tags.add_argument("--skip-vectors", action="store_true", help="do not queue chunk tag updates")
+    tags.set_defaults(handler=cmd_rebuild_tags)
+
+    export = commands.add_parser("batch-export", help="export pending notes as a Batch API JSONL job")
+    export.add_argument("kind", choices=[batch_jobs.SUMMARIZE, batch_jobs.EMBED])
+    export.add_argument("--all", action="store_true", help="re-summarize every note (after a prompt change)")
+    export.add_argument("--limit", type=int, default=None, help="maximum number of notes")
+    export.set_defaults(handler=cmd_batch_export)
+
+    submit = commands.add_parser("batch-submit", help="submit an exported job")
+    submit.add_argument("job_id")
+    submit.add_argument("--transport", choices=sorted(batch_jobs.TRANSPORTS), default="openai")
+    submit.set_defaults(handler=cmd_batch_submit)
+
+    status = commands.add_parser("batch-status", help="poll a submitted job and download finished results")
+    status.add_argument("job_id")
+    status.add_argument("--wait", action="store_true", help="poll until every batch has finished")
+    status.add_argument("--interval", type=float, default=60.0, help="seconds between polls")
+    status.set_defaults(handler=cmd_batch_status)
+
+    apply = commands.add_parser("batch-apply", help="apply downloaded results to notes and the vector store")
+    apply.add_argument("job_id")
+    apply.set_defaults(handler=cmd_batch_apply)
+
+    snapshot_export = commands.add_parser("export", help="stream a snapshot of notes, connections and vectors")
+    snapshot_export.add_argument("output", help="output file (.gz to compress)")
+    snapshot_export.add_argument("--format", choices=[snapshot.NDJSON, snapshot.COLUMNAR], default=snapshot.NDJSON)
+    snapshot_export.add_argument("--user-id", type=int, default=None, help="only this user's notes")
+    snapshot_export.add_argument("--no-vectors", action="store_true", help="skip embedding vectors")
+    snapshot_export.add_argument("--batch-size", type=int, default=500)
+    snapshot_export.set_defaults(handler=cmd_export)
+
+    restore = commands.add_parser("restore", help="restore a snapshot without calling the embedding API")
+    restore.add_argument("input", help="snapshot file (.gz supported)")
+    restore.add_argument("--batch-size", type=int, default=500)
+    restore.set_defaults(handler=cmd_restore)
+
+    return parser
+
+def needs_vector_store(args) -> bool:
+    """벡터 저장소 연결이 필요한 명령인지 (outbox만 쌓는 명령은 로컬 인덱스를 잠그지 않음)"""
+    if args.command == "backfill-chunks":
+        return args.drop_legacy
+    return args.command not in ("rebuild-tags", "batch-export", "batch-submit", "batch-status")
+
+async def run(args) -> None:
+    if not needs_vector_store(args):
+        await args.handler(args)
+        return
+    try:
+        vector_store.connect()
+    except IndexLockedError as e:
+        print(f"{e}\nStop the API server before running '{args.command}', "
+              "or queue the work with rebuild-tags/backfill-chunks and let the server's outbox worker apply it.")
+        sys.exit(1)
+    try:
+        await args.handler(args)
+    finally:
+        vector_store.close()
+
+def main() -> None:
+    args = build_parser().parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
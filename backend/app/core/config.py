@@ -24,10 +24,59 @@ class Settings:
     WEAVIATE_URL: str = os.getenv("WEAVIATE_URL", "")
     WEAVIATE_API_KEY: str = os.getenv("WEAVIATE_API_KEY", "")
     
+    # 로컬 벡터 인덱스 (Weaviate 미사용 또는 연결 실패 시)
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "weaviate")  # weaviate | local
+    LOCAL_INDEX_DIR: str = os.getenv("LOCAL_INDEX_DIR", "./data/vector_index")
+    LOCAL_INDEX_QUANTIZATION: str = os.getenv("LOCAL_INDEX_QUANTIZATION", "int8")  # none | int8 | pq
+    LOCAL_INDEX_DIMENSIONS: int = int(os.getenv("LOCAL_INDEX_DIMENSIONS", "512"))  # 후보 선정용 Matryoshka 차원 (0 = 축소 없음)
+    LOCAL_INDEX_PQ_SUBVECTORS: int = int(os.getenv("LOCAL_INDEX_PQ_SUBVECTORS", "64"))
+    LOCAL_INDEX_RERANK: int = 4  # 원본 벡터로 재채점할 후보 배율
+    LOCAL_INDEX_ANN: str = os.getenv("LOCAL_INDEX_ANN", "ivf")  # ivf | none
+    LOCAL_INDEX_IVF_LISTS: int = int(os.getenv("LOCAL_INDEX_IVF_LISTS", "0"))  # 0 = 4*sqrt(N)
+    LOCAL_INDEX_IVF_NPROBE: int = int(os.getenv("LOCAL_INDEX_IVF_NPROBE", "16"))  # 클수록 recall↑ 지연↑
+    LOCAL_INDEX_IVF_MIN_ROWS: int = 20000  # 이보다 적으면 전체 스캔
+    LOCAL_INDEX_FLUSH_EVERY: int = 200  # 변경 N건마다 디스크 저장
+    
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     GPT_MODEL: str = "gpt-4o-mini"
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+    # 청킹 (긴 노트를 겹치는 구간으로 나눠 임베딩)
+    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1500"))  # characters
+    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))  # characters
+    CHUNK_POOLING: str = os.getenv("CHUNK_POOLING", "max")  # max | mean
+    CHUNK_SEARCH_FANOUT: int = 4  # 노트 1개당 조회할 청크 수 배율
+
+    # 벡터 outbox (DB -> 벡터 저장소 반영)
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+    OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # seconds
+    OUTBOX_MAX_BACKOFF: int = 3600  # seconds
+    OUTBOX_LEASE: int = 300  # 처리 중인 작업을 다른 작업자가 가져가지 않는 시간 (seconds)
+    
+    # 오프라인 배치 작업 (OpenAI Batch API 형식 JSONL)
+    BATCH_DIR: str = os.getenv("BATCH_DIR", "./data/batches")
+    BATCH_MAX_REQUESTS: int = 50000  # 파일당 요청 수 (Batch API 한도)
+    BATCH_EMBED_MAX_REQUESTS: int = 10000  # 임베딩 결과는 적용 시 파일 단위로 메모리에 올림
+    BATCH_MAX_FILE_BYTES: int = 190 * 1024 * 1024  # Batch API 한도 200MB
+    BATCH_APPLY_SIZE: int = 500  # 결과 적용 시 한 번에 처리할 노트 수
+    
+    # 유사 노트 검색 캐시
+    SIMILAR_CACHE_SIZE: int = int(os.getenv("SIMILAR_CACHE_SIZE", "2048"))  # entries
+    SIMILAR_CACHE_TTL: int = int(os.getenv("SIMILAR_CACHE_TTL", "300"))  # seconds
+    
+    # 그래프
+    GRAPH_MAX_NODES: int = int(os.getenv("GRAPH_MAX_NODES", "2000"))
+    GRAPH_LAYOUT_CACHE_SIZE: int = 64  # 그래프 버전별 레이아웃 캐시
+    
+    # 인사이트 프롬프트 (토큰 예산 안에서 노트 배분)
+    INSIGHT_PROMPT_TOKENS: int = int(os.getenv("INSIGHT_PROMPT_TOKENS", "6000"))  # 노트 본문에 쓸 토큰
+    INSIGHT_MIN_NOTE_TOKENS: int = 150  # 노트당 최소 토큰 (부족하면 map-reduce)
+    INSIGHT_MAX_NOTES: int = int(os.getenv("INSIGHT_MAX_NOTES", "200"))
+    INSIGHT_MAP_CONCURRENCY: int = int(os.getenv("INSIGHT_MAP_CONCURRENCY", "4"))
+    INSIGHT_MAP_SUMMARY_TOKENS: int = 400  # 그룹 요약 최대 출력 토큰
+    TOKEN_CACHE_SIZE: int = 4096  # 토큰화된 조각 캐시
     
     # CORS
     BACKEND_CORS_ORIGINS: list = [
@@ -46,6 +95,26 @@ class Settings:
     MAX_NOTES_PER_USER: int = 1000
     MAX_CONTENT_LENGTH: int = 50000  # characters
     
+    # 요청 제한 (사용자별 토큰 버킷)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # 앞단 로드 밸런서/프록시 수 - X-Forwarded-For에서 클라이언트 주소를 찾을 위치 (0 = 직접 연결 주소 사용)
+    RATE_LIMIT_PROXY_HOPS: int = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+    RATE_LIMIT_LLM_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_LLM_PER_MINUTE", "20"))  # analyze/insight/similar
+    RATE_LIMIT_LLM_BURST: int = int(os.getenv("RATE_LIMIT_LLM_BURST", "10"))
+    RATE_LIMIT_WRITE_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_WRITE_PER_MINUTE", "60"))  # 노트 생성/수정/삭제
+    RATE_LIMIT_WRITE_BURST: int = int(os.getenv("RATE_LIMIT_WRITE_BURST", "30"))
+    RATE_LIMIT_EXPORT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_EXPORT_PER_MINUTE", "2"))  # 전체 스냅샷 내보내기
+    RATE_LIMIT_EXPORT_BURST: int = int(os.getenv("RATE_LIMIT_EXPORT_BURST", "2"))
+    
+    # 동시 실행 제한 (LLM 호출 엔드포인트별)
+    CONCURRENCY_ANALYZE: int = int(os.getenv("CONCURRENCY_ANALYZE", "4"))
+    CONCURRENCY_INSIGHT: int = int(os.getenv("CONCURRENCY_INSIGHT", "2"))
+    CONCURRENCY_SIMILAR: int = int(os.getenv("CONCURRENCY_SIMILAR", "8"))
+    CONCURRENCY_NOTE_WRITE: int = int(os.getenv("CONCURRENCY_NOTE_WRITE", "8"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))  # 엔드포인트별 대기열
+    ADMISSION_MAX_WAIT: float = float(os.getenv("ADMISSION_MAX_WAIT", "10"))  # seconds
+    ADMISSION_TARGET_LATENCY: float = float(os.getenv("ADMISSION_TARGET_LATENCY", "5"))  # 넘으면 대기열 축소
+    
     @property
     def is_production(self) -> bool:
         return self.ENVIRONMENT == "production"
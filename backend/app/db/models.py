@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Float, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.session import Base
@@ -24,7 +24,8 @@ class Note(Base):
     content = Column(Text, nullable=False)
     summary = Column(Text, nullable=True)
     tags = Column(JSON, default=list)
-    embedding_id = Column(String(255), nullable=True)  # Weaviate ID
+    title_hash = Column(String(64), nullable=True)  # 변경 감지용 sha256
+    content_hash = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -34,6 +35,37 @@ class Note(Base):
                               foreign_keys="[NoteConnection.source_note_id]",
                               back_populates="source_note",
                               cascade="all, delete-orphan")
+    chunks = relationship("NoteChunk", back_populates="note", cascade="all, delete-orphan")
+    tag_index = relationship("NoteTag", back_populates="note", cascade="all, delete-orphan")
+
+class NoteChunk(Base):
+    __tablename__ = "note_chunks"
+    __table_args__ = (UniqueConstraint("note_id", "content_hash"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # 제목 + 청크 내용 + 임베딩 모델 해시
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # 관계
+    note = relationship("Note", back_populates="chunks")
+
+class NoteTag(Base):
+    """태그 검색용 정규화 테이블 (Note.tags JSON과 같은 내용, 소문자 정규화)"""
+    __tablename__ = "note_tags"
+    __table_args__ = (
+        UniqueConstraint("note_id", "tag"),
+        Index("ix_note_tags_user_tag", "user_id", "tag"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)  # 태그 조회 시 notes 조인 없이 사용자 필터
+    tag = Column(String(100), nullable=False)
+
+    # 관계
+    note = relationship("Note", back_populates="tag_index")
 
 class NoteConnection(Base):
     __tablename__ = "note_connections"
@@ -47,3 +79,18 @@ class NoteConnection(Base):
     # 관계
     source_note = relationship("Note", foreign_keys=[source_note_id], back_populates="connections")
     target_note = relationship("Note", foreign_keys=[target_note_id])
+
+class VectorOutbox(Base):
+    """벡터 저장소에 반영할 작업 (노트 변경과 같은 트랜잭션에서 기록)"""
+    __tablename__ = "vector_outbox"
+    __table_args__ = (Index("ix_vector_outbox_pending", "processed_at", "available_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(Integer, nullable=False, index=True)  # 삭제된 노트도 가리키므로 FK 없음
+    user_id = Column(Integer, nullable=False)
+    operation = Column(String(16), nullable=False)  # upsert | retag | delete
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime(timezone=True), server_default=func.now())  # 재시도 시각
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
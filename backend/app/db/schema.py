@@ -0,0 +1,29 @@
+from typing import List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# create_all은 이미 있는 테이블을 바꾸지 않으므로, 나중에 추가된 컬럼은 시작 시 여기서 보정
+# (테이블, 컬럼, 타입)
+ADDED_COLUMNS = [
+    ("notes", "title_hash", "VARCHAR(64)"),
+    ("notes", "content_hash", "VARCHAR(64)"),
+]
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """누락된 컬럼 추가 (여러 번 실행해도 안전)
+
+    반환: 추가한 "테이블.컬럼" 목록
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table, column, column_type in ADDED_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            if column in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            # PostgreSQL은 여러 워커가 동시에 시작해도 안전하게 IF NOT EXISTS 사용 (SQLite는 미지원)
+            if_not_exists = "IF NOT EXISTS " if engine.dialect.name == "postgresql" else ""
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {if_not_exists}{column} {column_type}"))
+            added.append(f"{table}.{column}")
+    return added
@@ -5,8 +5,10 @@ from contextlib import asynccontextmanager
 import logging
 from app.core.config import settings
 from app.db.session import Base, engine
+from app.db.schema import upgrade_schema
 from app.routers import health, notes
 from app.services.vector_store import vector_store
+from app.services.outbox import outbox_worker
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO if settings.is_production else logging.DEBUG)
@@ -21,6 +23,9 @@ async def lifespan(app: FastAPI):
     # DB 테이블 생성
     try:
         Base.metadata.create_all(bind=engine)
+        added = upgrade_schema(engine)
+        if added:
+            logger.info(f"Added missing columns: {', '.join(added)}")
         logger.info("Database tables created/verified")
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
@@ -32,10 +37,14 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Vector store connection failed (will use fallback): {e}")
     
+    # 벡터 outbox 작업자 시작
+    outbox_worker.start()
+    
     yield
     
     # 종료 시
     logger.info(f"Shutting down {settings.PROJECT_NAME} API...")
+    await outbox_worker.stop()
     vector_store.close()
 
 # FastAPI 앱 생성
@@ -1,29 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.db.session import get_db
 from app.db import models
+from app.core.config import settings
 from app.schemas.note import (
     NoteCreate, NoteUpdate, NoteOut, NoteWithConnections,
     AnalyzeRequest, AnalyzeResponse,
-    SimilarNote, SimilarNotesResponse,
+    SimilarNote, SimilarNotesResponse, TagFacet,
     GraphData, GraphNode, GraphEdge,
     InsightRequest, InsightResponse
 )
 from app.services.openai_client import embed_text, summarize_and_keywords, generate_insight
 from app.services.vector_store import vector_store
+from app.services.query_cache import similarity_cache
+from app.services.enrichment import detect_changes, stamp_hashes
+from app.services.graph_data import load_graph, negotiate, encode
+from app.services.graph_layout import apply_layout
+from app.services.admission import admission, admitted, charge, rate_limit
+from app.services.snapshot import iter_snapshot, MEDIA_TYPES, NDJSON
+from app.services.prompt_packing import pack_notes_for_insight
+from app.services.tags import set_note_tags, notes_with_tags, normalize_tags, tag_facets
+from app.services.outbox import enqueue, drain_outbox, UPSERT, RETAG, DELETE
 
 router = APIRouter(prefix="/notes", tags=["notes"])
 
 # 더미 사용자 ID (실제로는 인증 시스템 필요)
 DUMMY_USER_ID = 1
 
-@router.post("/create", response_model=NoteOut)
+# 노트 쓰기 제한 (요약/임베딩 호출 포함: 사용자별 요청 수 + 동시 실행 수)
+WRITE_LIMITS = [Depends(rate_limit("write")), Depends(admission("note_write"))]
+
+@router.post("/create", response_model=NoteOut, dependencies=WRITE_LIMITS)
 async def create_note(
     payload: NoteCreate,
     db: Session = Depends(get_db)
 ):
     """새 노트 생성"""
+    note_count = db.query(models.Note).filter(models.Note.user_id == DUMMY_USER_ID).count()
+    if note_count >= settings.MAX_NOTES_PER_USER:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Note limit reached ({settings.MAX_NOTES_PER_USER})"
+        )
+    
     try:
         # 사용자 확인 또는 생성 (임시)
         user = db.query(models.User).filter(models.User.id == DUMMY_USER_ID).first()
@@ -42,7 +63,12 @@ async def create_note(
             title=payload.title,
             content=payload.content
         )
+        stamp_hashes(note)
         db.add(note)
+        db.flush()
+        
+        # 벡터 반영 작업을 노트와 같은 트랜잭션으로 기록
+        enqueue(db, note.id, user.id, UPSERT)
         db.commit()
         db.refresh(note)
         
@@ -53,45 +79,15 @@ async def create_note(
             
             # 노트 업데이트
             note.summary = summary
-            note.tags = keywords + topics
+            if set_note_tags(note, keywords + topics):
+                # 요약 중에 작업자가 먼저 태그 없이 색인했을 수 있으므로 청크 태그 갱신 작업을 다시 기록
+                enqueue(db, note.id, user.id, RETAG)
             db.commit()
             db.refresh(note)
             
-            # 벡터 임베딩 생성 및 저장
-            vector = await embed_text(f"{payload.title}\n{payload.content}")
-            if vector:
-                embedding_id = await vector_store.upsert_vector(
-                    note_id=note.id,
-                    user_id=user.id,
-                    title=payload.title,
-                    content=payload.content,
-                    summary=summary,
-                    vector=vector
-                )
-                if embedding_id:
-                    note.embedding_id = embedding_id
-                    db.commit()
-                    db.refresh(note)
-            
-            # 유사한 노트 찾아서 연결 생성
-            if vector:
-                similar_results = await vector_store.search_similar(
-                    vector=vector,
-                    user_id=user.id,
-                    limit=5,
-                    min_score=0.7
-                )
-                
-                for sim_note_id, _, _, sim_score in similar_results:
-                    if sim_note_id != note.id:  # 자기 자신 제외
-                        connection = models.NoteConnection(
-                            source_note_id=note.id,
-                            target_note_id=sim_note_id,
-                            similarity_score=sim_score
-                        )
-                        db.add(connection)
-                
-                db.commit()
+            # 청크 임베딩 저장 및 유사 노트 연결 (실패 시 outbox 작업자가 재시도)
+            await drain_outbox(db, note_id=note.id)
+            db.refresh(note)
                 
         except Exception as e:
             print(f"AI processing error: {e}")
@@ -107,17 +103,43 @@ async def create_note(
 def list_notes(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    tag: Optional[List[str]] = Query(None),
     db: Session = Depends(get_db)
 ):
-    """노트 목록 조회"""
-    notes = db.query(models.Note)\
-        .filter(models.Note.user_id == DUMMY_USER_ID)\
+    """노트 목록 조회 (tag를 여러 번 주면 모든 태그를 가진 노트만)"""
+    query = db.query(models.Note)\
+        .filter(models.Note.user_id == DUMMY_USER_ID)
+    if tag:
+        query = query.filter(models.Note.id.in_(notes_with_tags(db, DUMMY_USER_ID, tag)))
+    notes = query\
         .order_by(models.Note.created_at.desc())\
         .offset(skip)\
         .limit(limit)\
         .all()
     return notes
 
+@router.get("/tags/facets", response_model=List[TagFacet])
+def get_tag_facets(
+    tag: Optional[List[str]] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """태그별 노트 수 (tag를 주면 그 태그를 가진 노트 안에서 함께 붙은 태그 집계)"""
+    return tag_facets(db, DUMMY_USER_ID, tag, limit)
+
+@router.get("/export", dependencies=[Depends(rate_limit("export"))])
+def export_notes(
+    format: str = Query(NDJSON, pattern="^(ndjson|columnar)$"),
+    vectors: bool = Query(True),
+):
+    """노트/연결/임베딩 벡터 스트리밍 내보내기 (python -m app.cli restore로 복원)"""
+    # 응답이 끝날 때까지 DB를 읽으므로 세션은 요청 의존성 대신 iter_snapshot이 직접 관리
+    return StreamingResponse(
+        iter_snapshot(DUMMY_USER_ID, format, include_vectors=vectors),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="notes-export.{format}.jsonl"'}
+    )
+
 @router.get("/{note_id}", response_model=NoteWithConnections)
 def get_note(
     note_id: int,
@@ -148,7 +170,7 @@ def get_note(
     
     return result
 
-@router.put("/{note_id}", response_model=NoteOut)
+@router.put("/{note_id}", response_model=NoteOut, dependencies=WRITE_LIMITS)
 async def update_note(
     note_id: int,
     payload: NoteUpdate,
@@ -163,38 +185,39 @@ async def update_note(
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
+    # 제목/내용이 실제로 바뀌었는지 확인 (자동 저장 등 동일한 PUT은 AI 처리 생략)
+    title_changed, content_changed = detect_changes(note, payload.title, payload.content)
+    if not title_changed and not content_changed:
+        return note
+    retag = False
+    
     # 업데이트
-    if payload.title is not None:
+    if title_changed:
         note.title = payload.title
-    if payload.content is not None:
+    if content_changed:
         note.content = payload.content
         
-        # 내용 변경 시 재분석
+        # 내용 변경 시 재분석 (제목만 바뀐 경우 요약은 유지)
         summary, keywords, topics = await summarize_and_keywords(payload.content)
         note.summary = summary
-        note.tags = keywords + topics
-        
-        # 벡터 재생성
-        vector = await embed_text(f"{note.title}\n{note.content}")
-        if vector:
-            embedding_id = await vector_store.upsert_vector(
-                note_id=note.id,
-                user_id=DUMMY_USER_ID,
-                title=note.title,
-                content=note.content,
-                summary=summary,
-                vector=vector
-            )
-            if embedding_id:
-                note.embedding_id = embedding_id
+        retag = set_note_tags(note, keywords + topics)
+    stamp_hashes(note)
     
+    # 바뀐 청크만 다시 임베딩 (청크 해시에 제목이 포함되어 제목 변경 시 전체 재임베딩)
+    # 태그가 바뀌었을 때만 유지된 청크의 태그도 갱신
+    enqueue(db, note.id, note.user_id, RETAG if retag else UPSERT)
     db.commit()
+    try:
+        await drain_outbox(db, note_id=note.id)
+    except Exception as e:
+        print(f"Vector sync error (will retry): {e}")
+        db.rollback()
     db.refresh(note)
     
     return note
 
-@router.delete("/{note_id}")
-def delete_note(
+@router.delete("/{note_id}", dependencies=[Depends(rate_limit("write"))])
+async def delete_note(
     note_id: int,
     db: Session = Depends(get_db)
 ):
@@ -207,15 +230,30 @@ def delete_note(
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    # 벡터 저장소에서도 삭제
-    vector_store.delete_note_vector(note_id)
-    
+    # 이 노트를 가리키는 연결 제거 (FK)
+    db.query(models.NoteConnection)\
+        .filter(models.NoteConnection.target_note_id == note_id)\
+        .delete(synchronize_session=False)
     db.delete(note)
+    
+    # 벡터 저장소 삭제 작업을 같은 트랜잭션으로 기록
+    enqueue(db, note_id, DUMMY_USER_ID, DELETE)
     db.commit()
+    similarity_cache.bump(DUMMY_USER_ID)
+    
+    try:
+        await drain_outbox(db, note_id=note_id)
+    except Exception as e:
+        print(f"Vector delete error (will retry): {e}")
+        db.rollback()
     
     return {"message": "Note deleted successfully"}
 
-@router.post("/analyze", response_model=AnalyzeResponse)
+@router.post(
+    "/analyze",
+    response_model=AnalyzeResponse,
+    dependencies=[Depends(rate_limit("llm")), Depends(admission("analyze"))]
+)
 async def analyze_text(payload: AnalyzeRequest):
     """텍스트 AI 분석 (저장 없이)"""
     try:
@@ -230,30 +268,51 @@ async def analyze_text(payload: AnalyzeRequest):
 
 @router.post("/similar", response_model=SimilarNotesResponse)
 async def find_similar(
+    request: Request,
     query: str,
     limit: int = Query(5, ge=1, le=20),
+    tag: Optional[List[str]] = Query(None),
     db: Session = Depends(get_db)
 ):
-    """유사한 노트 검색"""
+    """유사한 노트 검색 (tag로 검색 대상 노트를 먼저 좁힘)"""
     try:
-        # 쿼리 벡터화
-        vector = await embed_text(query)
+        tags = tuple(sorted(normalize_tags(tag)))
         
-        if not vector:
-            return SimilarNotesResponse(query=query, similar_notes=[])
+        # 캐시 확인 (같은 쿼리 반복 시 임베딩/벡터 검색 생략)
+        cached = similarity_cache.get(DUMMY_USER_ID, query, limit, tags)
+        if cached is not None:
+            return SimilarNotesResponse(query=query, similar_notes=cached)
+        generation = similarity_cache.generation(DUMMY_USER_ID)
         
-        # 유사도 검색
-        results = await vector_store.search_similar(
-            vector=vector,
-            user_id=DUMMY_USER_ID,
-            limit=limit,
-            min_score=0.6
-        )
+        # 캐시 미스일 때만 요청 한도 차감 + 동시 실행 제한
+        charge("llm", request)
+        async with admitted("similar"):
+            # 쿼리 벡터화
+            vector = await embed_text(query)
+            
+            if not vector:
+                # 임베딩 실패 - 일시적 오류일 수 있으므로 캐시에 저장하지 않음
+                return SimilarNotesResponse(query=query, similar_notes=[])
+            
+            # 유사도 검색 (청크에 저장된 태그로 사전 필터)
+            results = await vector_store.search_similar(
+                vector=vector,
+                user_id=DUMMY_USER_ID,
+                limit=limit,
+                min_score=0.6,
+                tags=list(tags) or None
+            )
         
-        # 노트 정보 조회
+        # 노트 정보 조회 (한 번에)
+        notes_by_id = {
+            note.id: note
+            for note in db.query(models.Note)
+                .filter(models.Note.id.in_([r[0] for r in results]))
+                .all()
+        }
         similar_notes = []
         for note_id, title, summary, score in results:
-            note = db.query(models.Note).filter(models.Note.id == note_id).first()
+            note = notes_by_id.get(note_id)
             if note:
                 similar_notes.append(SimilarNote(
                     id=note.id,
@@ -263,76 +322,99 @@ async def find_similar(
                     tags=note.tags or []
                 ))
         
+        similarity_cache.set(DUMMY_USER_ID, query, limit, similar_notes, tags, generation=generation)
         return SimilarNotesResponse(
             query=query,
             similar_notes=similar_notes
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/graph/data", response_model=GraphData)
 def get_graph_data(
-    limit: int = Query(50, ge=10, le=200),
+    response: Response,
+    limit: int = Query(50, ge=10, le=settings.GRAPH_MAX_NODES),
+    accept: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """그래프 시각화용 데이터"""
-    # 최근 노트들
-    notes = db.query(models.Note)\
-        .filter(models.Note.user_id == DUMMY_USER_ID)\
-        .order_by(models.Note.created_at.desc())\
-        .limit(limit)\
-        .all()
-    
-    # 노드 생성
-    nodes = []
-    node_ids = set()
-    for note in notes:
-        nodes.append(GraphNode(
-            id=f"note_{note.id}",
-            label=note.title[:50],  # 제목 길이 제한
-            group=note.tags[0] if note.tags else "default",
-            size=1.0 + len(note.connections) * 0.2  # 연결 수에 따른 크기
-        ))
-        node_ids.add(note.id)
+    """그래프 시각화용 데이터
+
+    Accept 헤더가 application/vnd.brainsxlm.graph+json (또는 +msgpack)이면
+    모델 생성 없이 정수 인덱스 기반 열 배열로 응답한다.
+    노드 좌표(x, y)와 커뮤니티 그룹은 서버에서 계산해 그래프 버전별로 캐시한다.
+    """
+    graph = apply_layout(load_graph(db, DUMMY_USER_ID, limit))
     
-    # 엣지 생성
-    edges = []
-    seen_edges = set()
+    # 같은 URL이 Accept에 따라 다른 형식으로 응답하므로 캐시가 구분하도록 두 응답 모두에 지정
+    response.headers["Vary"] = "Accept"
+    media_type = negotiate(accept)
+    if media_type:
+        return Response(
+            content=encode(graph, media_type),
+            media_type=media_type,
+            headers={"Vary": "Accept"}
+        )
     
-    for note in notes:
-        for conn in note.connections:
-            # 양방향 중복 방지
-            edge_key = tuple(sorted([note.id, conn.target_note_id]))
-            
-            if edge_key not in seen_edges and conn.target_note_id in node_ids:
-                edges.append(GraphEdge(
-                    source=f"note_{note.id}",
-                    target=f"note_{conn.target_note_id}",
-                    weight=conn.similarity_score
-                ))
-                seen_edges.add(edge_key)
+    # 기본 응답 (노드/엣지 객체 목록)
+    nodes_col = graph["nodes"]
+    edges_col = graph["edges"]
+    node_ids = [f"note_{note_id}" for note_id in nodes_col["id"]]
+    nodes = [
+        GraphNode(
+            id=node_ids[i],
+            label=nodes_col["label"][i],
+            group=graph["groups"][nodes_col["group"][i]],
+            size=1.0 + nodes_col["degree"][i] * 0.2,  # 연결 수에 따른 크기
+            x=nodes_col["x"][i],
+            y=nodes_col["y"][i]
+        )
+        for i in range(len(node_ids))
+    ]
+    edges = [
+        GraphEdge(
+            source=node_ids[source],
+            target=node_ids[target],
+            weight=weight
+        )
+        for source, target, weight in zip(edges_col["source"], edges_col["target"], edges_col["weight"])
+    ]
     
     return GraphData(nodes=nodes, edges=edges)
 
-@router.post("/insight", response_model=InsightResponse)
+@router.post(
+    "/insight",
+    response_model=InsightResponse,
+    dependencies=[Depends(rate_limit("llm")), Depends(admission("insight"))]
+)
 async def generate_insight_from_notes(
     payload: InsightRequest,
     db: Session = Depends(get_db)
 ):
     """선택된 노트들로부터 인사이트 생성"""
+    note_ids = list(dict.fromkeys(payload.note_ids))
+    if len(note_ids) > settings.INSIGHT_MAX_NOTES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many notes (max {settings.INSIGHT_MAX_NOTES})"
+        )
+    
     try:
-        # 노트 내용 가져오기
+        # 노트 내용 가져오기 (요청한 순서 유지)
         notes = db.query(models.Note)\
-            .filter(models.Note.id.in_(payload.note_ids))\
+            .filter(models.Note.id.in_(note_ids))\
             .filter(models.Note.user_id == DUMMY_USER_ID)\
             .all()
         
         if not notes:
             raise HTTPException(status_code=404, detail="No notes found")
+        order = {note_id: i for i, note_id in enumerate(note_ids)}
+        notes.sort(key=lambda note: order[note.id])
         
-        # 노트 내용 추출
-        notes_content = [f"{note.title}\n{note.content}" for note in notes]
+        # 토큰 예산에 맞춰 요약 + 관련 청크 배분 (노트가 많으면 map-reduce)
+        notes_content = await pack_notes_for_insight(notes)
         
         # 인사이트 생성
         insight, topics = await generate_insight(notes_content)
@@ -341,7 +423,7 @@ async def generate_insight_from_notes(
         suggested_connections = []
         for note in notes[:3]:  # 최대 3개 노트만
             # 각 노트의 유사 노트 찾기
-            if note.embedding_id:
+            if note.chunks:
                 vector = await vector_store.get_note_vector(note.id)
                 if vector:
                     similar = await vector_store.search_similar(
@@ -365,5 +447,7 @@ async def generate_insight_from_notes(
             suggested_connections=suggested_connections[:5]  # 최대 5개
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from app.core.config import settings
 
 # User Schemas
 class UserCreate(BaseModel):
@@ -21,11 +22,11 @@ class UserOut(BaseModel):
 # Note Schemas
 class NoteCreate(BaseModel):
     title: str
-    content: str
+    content: str = Field(..., max_length=settings.MAX_CONTENT_LENGTH)
 
 class NoteUpdate(BaseModel):
     title: Optional[str] = None
-    content: Optional[str] = None
+    content: Optional[str] = Field(None, max_length=settings.MAX_CONTENT_LENGTH)
 
 class NoteOut(BaseModel):
     id: int
@@ -45,7 +46,7 @@ class NoteWithConnections(NoteOut):
 
 # AI Analysis Schemas
 class AnalyzeRequest(BaseModel):
-    content: str
+    content: str = Field(..., max_length=settings.MAX_CONTENT_LENGTH)
 
 class AnalyzeResponse(BaseModel):
     summary: str
@@ -64,12 +65,19 @@ class SimilarNotesResponse(BaseModel):
     query: str
     similar_notes: List[SimilarNote]
 
+# Tag Schemas
+class TagFacet(BaseModel):
+    tag: str
+    count: int
+
 # Graph Schemas
 class GraphNode(BaseModel):
     id: str
     label: str
     group: Optional[str] = None
     size: Optional[float] = 1.0
+    x: Optional[float] = None  # 서버에서 계산한 좌표 (0~1)
+    y: Optional[float] = None
 
 class GraphEdge(BaseModel):
     source: str
@@ -0,0 +1,223 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, Optional, Tuple
+from fastapi import HTTPException, Request
+from app.core.config import settings
+
+class TokenBucket:
+    """초당 rate개씩 채워지고 최대 capacity개까지 쌓이는 토큰 버킷"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> Tuple[bool, float]:
+        """토큰 사용 시도. 반환: (허용 여부, 거부 시 다시 시도할 때까지 남은 초)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        return False, (cost - self.tokens) / self.rate
+
+class RateLimiter:
+    """사용자별 토큰 버킷 모음 (오래 안 쓴 버킷은 LRU로 정리)"""
+
+    def __init__(self, per_minute: int, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def take(self, key: Hashable, cost: float = 1.0) -> Tuple[bool, float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket.take(cost)
+
+class AdmissionRejected(Exception):
+    """동시 실행 한도와 대기열이 모두 찼거나 예상 대기 시간이 너무 긴 경우"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"overloaded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class AdmissionGate:
+    """엔드포인트별 동시 실행 제한 + 제한된 대기열
+
+    처리 시간의 지수 이동 평균을 추적해서, 업스트림(OpenAI) 지연이 목표치를 넘으면
+    대기열 길이를 그만큼 줄이고 예상 대기 시간이 max_wait을 넘는 요청은 바로 거절한다.
+    기다리다 실패할 요청을 일찍 돌려보내서 대기 중인 요청의 지연이 무한히 늘지 않게 한다.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        queue_size: int,
+        max_wait: float,
+        target_latency: float
+    ):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.target_latency = target_latency
+        self.active = 0
+        self.waiting = 0
+        self.latency: Optional[float] = None  # 처리 시간 EWMA (초)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def queue_limit(self) -> int:
+        """현재 허용하는 대기열 길이 (지연이 목표를 넘으면 비례해서 축소)"""
+        if self.latency is None or self.latency <= self.target_latency:
+            return self.queue_size
+        return int(self.queue_size * self.target_latency / self.latency)
+
+    def queued(self) -> int:
+        """실행 자리를 기다리는 요청 수"""
+        return max(0, self.active + self.waiting - self.concurrency)
+
+    def expected_wait(self) -> float:
+        """지금 들어오는 요청이 실행되기까지의 예상 대기 시간"""
+        if self.active + self.waiting < self.concurrency or self.latency is None:
+            return 0.0
+        return (self.queued() + 1) / self.concurrency * self.latency
+
+    def _observe(self, elapsed: float) -> None:
+        self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        if self.active + self.waiting >= self.concurrency:
+            if self.queued() >= self.queue_limit():
+                raise AdmissionRejected(self.latency or 1.0)
+            expected = self.expected_wait()
+            if expected > self.max_wait:
+                raise AdmissionRejected(expected)
+
+        self.waiting += 1
+        try:
+            if self._semaphore.locked():
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            else:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError:
+            raise AdmissionRejected(self.latency or self.max_wait)
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            self._observe(time.monotonic() - started)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "active": self.active,
+            "queued": self.queued(),
+            "queue_limit": self.queue_limit(),
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+        }
+
+def _gate(concurrency: int) -> AdmissionGate:
+    return AdmissionGate(
+        concurrency=concurrency,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        max_wait=settings.ADMISSION_MAX_WAIT,
+        target_latency=settings.ADMISSION_TARGET_LATENCY
+    )
+
+# LLM을 호출하는 엔드포인트별 게이트 (읽기 전용 엔드포인트는 제한하지 않음)
+gates: Dict[str, AdmissionGate] = {
+    "analyze": _gate(settings.CONCURRENCY_ANALYZE),
+    "insight": _gate(settings.CONCURRENCY_INSIGHT),
+    "similar": _gate(settings.CONCURRENCY_SIMILAR),
+    "note_write": _gate(settings.CONCURRENCY_NOTE_WRITE),
+}
+
+limiters: Dict[str, RateLimiter] = {
+    "llm": RateLimiter(settings.RATE_LIMIT_LLM_PER_MINUTE, settings.RATE_LIMIT_LLM_BURST),
+    "write": RateLimiter(settings.RATE_LIMIT_WRITE_PER_MINUTE, settings.RATE_LIMIT_WRITE_BURST),
+    "export": RateLimiter(settings.RATE_LIMIT_EXPORT_PER_MINUTE, settings.RATE_LIMIT_EXPORT_BURST),
+}
+
+def _retry_after(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+def client_key(request: Request) -> Hashable:
+    """요청자 식별 (인증 도입 전에는 클라이언트 주소로 구분)
+
+    로드 밸런서 뒤에서는 request.client가 프록시 주소라 모든 요청이 한 버킷을 쓰게 된다.
+    RATE_LIMIT_PROXY_HOPS가 있으면 신뢰하는 프록시들이 X-Forwarded-For 끝에 붙인 항목 중
+    가장 바깥 프록시가 본 주소를 쓴다 (그보다 앞의 항목은 클라이언트가 임의로 넣을 수 있음).
+    """
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is not None:
+        return ("user", user_id)
+    hops = settings.RATE_LIMIT_PROXY_HOPS
+    if hops > 0:
+        forwarded = [
+            host.strip()
+            for header in request.headers.getlist("x-forwarded-for")
+            for host in header.split(",")
+            if host.strip()
+        ]
+        if len(forwarded) >= hops:
+            return ("client", forwarded[-hops])
+    return ("client", request.client.host if request.client else "unknown")
+
+def charge(name: str, request: Request, cost: float = 1.0) -> None:
+    """사용자 토큰 버킷에서 차감 (초과 시 429 + Retry-After)
+
+    캐시 등으로 비용 없이 응답할 수 있는 엔드포인트는 실제 작업 직전에 직접 호출한다.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    allowed, wait = limiters[name].take(client_key(request), cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers=_retry_after(wait)
+        )
+
+@asynccontextmanager
+async def admitted(name: str) -> AsyncIterator[None]:
+    """게이트 자리를 점유한 채 실행 (과부하 시 503 + Retry-After)"""
+    try:
+        async with gates[name].admit():
+            yield
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry later",
+            headers=_retry_after(e.retry_after)
+        )
+
+def rate_limit(name: str, cost: float = 1.0):
+    """사용자별 토큰 버킷 의존성"""
+    async def dependency(request: Request) -> None:
+        charge(name, request, cost)
+
+    return dependency
+
+def admission(name: str):
+    """동시 실행 제한 의존성 (엔드포인트 실행 동안 자리 점유)"""
+    async def dependency() -> AsyncIterator[None]:
+        async with admitted(name):
+            yield
+
+    return dependency
@@ -0,0 +1,101 @@
+import math
+import sys
+import numpy as np
+from itertools import chain
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.quantization import kmeans, nearest_centroids
+
+class IVFIndex:
+    """IVF-flat 근사 최근접 이웃 인덱스
+
+    벡터를 k-means 중심점(리스트)에 배정해 두고, 검색 시 쿼리와 가까운
+    nprobe개 리스트의 행만 후보로 돌려준다. 행 번호는 LocalVectorIndex의 행을 그대로 사용.
+    삭제는 LocalVectorIndex의 alive 마스크로 걸러지고, 압축(compact) 때 리스트가 재구성된다.
+    """
+
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        min_rows: Optional[int] = None
+    ):
+        self.nlist = nlist or settings.LOCAL_INDEX_IVF_LISTS  # 0 = 행 수 기준 자동
+        self.nprobe = nprobe or settings.LOCAL_INDEX_IVF_NPROBE
+        self.min_rows = settings.LOCAL_INDEX_IVF_MIN_ROWS if min_rows is None else min_rows
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[List[int]] = []
+        self.trained_rows = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, rows: int) -> bool:
+        """처음 학습하거나, 학습 이후 데이터가 4배 이상 늘면 재학습"""
+        if rows < self.min_rows:
+            return False
+        return not self.trained or rows > self.trained_rows * 4
+
+    def train(self, sample: np.ndarray, total_rows: int) -> None:
+        """샘플로 중심점 학습 (행 배정은 add로 따로 수행)"""
+        nlist = self.nlist or int(4 * math.sqrt(total_rows))
+        nlist = max(16, min(nlist, 4096, len(sample)))
+        self.centroids = kmeans(sample, nlist, iterations=8)
+        self.lists = [[] for _ in range(len(self.centroids))]
+        self.trained_rows = total_rows
+
+    def add(self, data: np.ndarray, rows: np.ndarray) -> None:
+        """새 행을 가장 가까운 리스트에 추가"""
+        if not self.trained or not len(rows):
+            return
+        for row, list_id in zip(rows.tolist(), nearest_centroids(data, self.centroids).tolist()):
+            self.lists[list_id].append(row)
+
+    def probe(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """쿼리와 가까운 리스트들의 행 번호"""
+        nprobe = min(nprobe or self.nprobe, len(self.lists))
+        scores = self.centroids @ query
+        nearest = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        rows = chain.from_iterable(self.lists[i] for i in nearest)
+        return np.fromiter(rows, dtype=np.int64)
+
+    def remap(self, kept_rows: np.ndarray) -> None:
+        """압축 후 행 번호 재배치 (삭제된 행은 리스트에서 제거)"""
+        if not self.trained:
+            return
+        new_row = {int(old): new for new, old in enumerate(kept_rows.tolist())}
+        self.lists = [
+            [new_row[row] for row in rows if row in new_row]
+            for rows in self.lists
+        ]
+
+    def memory_bytes(self) -> int:
+        """중심점 + 리스트 크기 (리스트 원소는 파이썬 int 객체)"""
+        if not self.trained:
+            return 0
+        rows = sum(len(rows) for rows in self.lists)
+        return (
+            self.centroids.nbytes
+            + sum(sys.getsizeof(rows) for rows in self.lists)
+            + rows * sys.getsizeof(1 << 30)
+        )
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """저장용 배열 (리스트는 CSR 형태로 평탄화)"""
+        if not self.trained:
+            return {}
+        sizes = np.array([len(rows) for rows in self.lists], dtype=np.int64)
+        return {
+            "centroids": self.centroids,
+            "offsets": np.concatenate([[0], np.cumsum(sizes)]),
+            "rows": np.fromiter(chain.from_iterable(self.lists), dtype=np.int64, count=int(sizes.sum())),
+            "trained_rows": np.array(self.trained_rows),
+        }
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        offsets = state["offsets"]
+        rows = state["rows"]
+        self.centroids = np.asarray(state["centroids"])
+        self.lists = [rows[offsets[i]:offsets[i + 1]].tolist() for i in range(len(offsets) - 1)]
+        self.trained_rows = int(state["trained_rows"])
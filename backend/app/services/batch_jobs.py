@@ -0,0 +1,430 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import settings
+from app.db import models
+from app.services.chunking import build_chunks, text_hash
+from app.services.enrichment import VectorSyncError, index_note
+from app.services.openai_client import client, parse_summary, summary_request
+from app.services.outbox import enqueue, RETAG
+from app.services.query_cache import similarity_cache
+from app.services.tags import set_note_tags
+
+SUMMARIZE = "summarize"
+EMBED = "embed"
+ENDPOINTS = {SUMMARIZE: "/v1/chat/completions", EMBED: "/v1/embeddings"}
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+SUMMARY_FAILED = "요약 생성 실패"  # summarize_and_keywords 실패 시 저장되는 값
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def job_dir(job_id: str) -> str:
+    return os.path.join(settings.BATCH_DIR, job_id)
+
+def load_manifest(job_id: str) -> Dict[str, Any]:
+    with open(os.path.join(job_dir(job_id), "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest: Dict[str, Any]) -> None:
+    path = os.path.join(job_dir(manifest["id"]), "manifest.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+# --- 내보내기 ---
+
+def _iter_notes(db: Session, batch_size: int = 500) -> Iterator[models.Note]:
+    """id 순서로 노트를 페이지 단위로 읽기 (청크 목록 함께 로드, 페이지마다 세션 비움)"""
+    last_id = 0
+    while True:
+        notes = db.query(models.Note)\
+            .options(selectinload(models.Note.chunks))\
+            .filter(models.Note.id > last_id)\
+            .order_by(models.Note.id)\
+            .limit(batch_size)\
+            .all()
+        if not notes:
+            break
+        last_id = notes[-1].id
+        yield from notes
+        db.expunge_all()
+
+def _summary_requests(note: models.Note) -> List[Dict[str, Any]]:
+    # custom_id에 내용 해시를 넣어서 그 사이 수정된 노트의 결과는 적용하지 않음
+    return [{
+        "custom_id": f"{note.id}:{note.content_hash or text_hash(note.content)}",
+        "method": "POST",
+        "url": ENDPOINTS[SUMMARIZE],
+        "body": summary_request(note.content),
+    }]
+
+def _embed_requests(note: models.Note) -> List[Dict[str, Any]]:
+    # DB에 없는 청크 해시만 (임베딩 모델이 바뀌면 해시가 모두 바뀜)
+    existing = {row.content_hash for row in note.chunks}
+    return [
+        {
+            "custom_id": f"{note.id}:{chunk.hash}",
+            "method": "POST",
+            "url": ENDPOINTS[EMBED],
+            "body": {"model": settings.EMBEDDING_MODEL, "input": chunk.embedding_input},
+        }
+        for chunk in build_chunks(note.title, note.content)
+        if chunk.hash not in existing
+    ]
+
+class _JsonlWriter:
+    """요청 수/파일 크기 한도에 맞춰 여러 JSONL 파일로 나눠 쓰기 (노트 하나의 요청은 같은 파일에)"""
+
+    def __init__(self, directory: str, max_requests: int, max_bytes: int):
+        self.directory = directory
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.files: List[Dict[str, Any]] = []
+        self._handle = None
+        self._bytes = 0
+
+    def write(self, requests: List[Dict[str, Any]]) -> None:
+        lines = [(json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in requests]
+        size = sum(len(line) for line in lines)
+        current = self.files[-1] if self.files else None
+        if current is None or (current["requests"] and (
+            current["requests"] + len(lines) > self.max_requests or self._bytes + size > self.max_bytes
+        )):
+            self._open()
+        for line in lines:
+            self._handle.write(line)
+        self.files[-1]["requests"] += len(lines)
+        self._bytes += size
+
+    def _open(self) -> None:
+        self.close()
+        name = f"input-{len(self.files):04d}.jsonl"
+        self._handle = open(os.path.join(self.directory, name), "wb")
+        self._bytes = 0
+        self.files.append({
+            "input": name,
+            "requests": 0,
+            "batch_id": None,
+            "status": "exported",
+            "output": None,
+            "errors": None,
+        })
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+def export_job(
+    db: Session,
+    kind: str,
+    everything: bool = False,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """처리할 노트를 Batch API 형식 JSONL로 내보내고 작업 manifest 생성
+
+    summarize: 요약이 없거나 실패한 노트 (everything=True면 전체, 프롬프트 변경 후 재요약용)
+    embed: DB 청크 목록과 해시가 다른 청크 (임베딩 모델 변경 후 재임베딩용)
+    """
+    if kind not in ENDPOINTS:
+        raise ValueError(f"unknown batch kind: {kind}")
+    job_id = f"{kind}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%fZ}"
+    directory = job_dir(job_id)
+    os.makedirs(directory, exist_ok=True)
+
+    max_requests = settings.BATCH_MAX_REQUESTS if kind == SUMMARIZE else settings.BATCH_EMBED_MAX_REQUESTS
+    writer = _JsonlWriter(directory, max_requests, settings.BATCH_MAX_FILE_BYTES)
+    note_count = 0
+    try:
+        for note in _iter_notes(db):
+            if kind == SUMMARIZE:
+                if not everything and note.summary and note.summary != SUMMARY_FAILED:
+                    continue
+                requests = _summary_requests(note)
+            else:
+                requests = _embed_requests(note)
+            if not requests:
+                continue
+            writer.write(requests)
+            note_count += 1
+            if limit and note_count >= limit:
+                break
+    finally:
+        writer.close()
+
+    manifest = {
+        "id": job_id,
+        "kind": kind,
+        "created_at": _now(),
+        "notes": note_count,
+        "requests": sum(f["requests"] for f in writer.files),
+        "transport": None,
+        "files": writer.files,
+        "applied_at": None,
+        "report": None,
+    }
+    save_manifest(manifest)
+    return manifest
+
+# --- 전송 ---
+
+class BatchTransport:
+    """배치 파일 제출/상태 조회/결과 다운로드 인터페이스"""
+    name = ""
+
+    async def submit(self, input_path: str, endpoint: str) -> str:
+        raise NotImplementedError
+
+    async def retrieve(self, batch_id: str) -> Dict[str, Optional[str]]:
+        """반환: {"status", "output_file_id", "error_file_id"}"""
+        raise NotImplementedError
+
+    async def download(self, file_id: str, dest_path: str) -> None:
+        raise NotImplementedError
+
+class OpenAIBatchTransport(BatchTransport):
+    """OpenAI Batch API (24시간 처리, 실시간 요청과 별도 한도)"""
+    name = "openai"
+
+    async def submit(self, input_path: str, endpoint: str) -> str:
+        with open(input_path, "rb") as f:
+            uploaded = await client.files.create(file=f, purpose="batch")
+        batch = await client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=endpoint,
+            completion_window="24h"
+        )
+        return batch.id
+
+    async def retrieve(self, batch_id: str) -> Dict[str, Optional[str]]:
+        batch = await client.batches.retrieve(batch_id)
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+        }
+
+    async def download(self, file_id: str, dest_path: str) -> None:
+        async with client.files.with_streaming_response.content(file_id) as response:
+            await response.stream_to_file(dest_path)
+
+class LocalBatchTransport(BatchTransport):
+    """네트워크 없이 결정적인 가짜 결과를 만드는 전송 (개발/테스트용)
+
+    요약은 원문 앞부분과 빈도 높은 단어, 임베딩은 단어 해시 벡터로 만든다.
+    """
+    name = "local"
+    dimensions = 1536
+
+    def __init__(self):
+        self.directory = os.path.join(settings.BATCH_DIR, "_local")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, batch_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}.{suffix}.jsonl")
+
+    async def submit(self, input_path: str, endpoint: str) -> str:
+        batch_id = "local_" + hashlib.sha1(f"{input_path}:{_now()}".encode()).hexdigest()[:16]
+        shutil.copyfile(input_path, self._path(batch_id, "input"))
+        return batch_id
+
+    async def retrieve(self, batch_id: str) -> Dict[str, Optional[str]]:
+        output_path = self._path(batch_id, "output")
+        if not os.path.exists(output_path):
+            self._run(batch_id, output_path)
+        return {"status": "completed", "output_file_id": output_path, "error_file_id": None}
+
+    async def download(self, file_id: str, dest_path: str) -> None:
+        shutil.copyfile(file_id, dest_path)
+
+    def _run(self, batch_id: str, output_path: str) -> None:
+        with open(self._path(batch_id, "input"), encoding="utf-8") as source, \
+                open(output_path + ".tmp", "w", encoding="utf-8") as target:
+            for line in source:
+                request = json.loads(line)
+                if request["url"] == ENDPOINTS[EMBED]:
+                    body = {"data": [{"index": 0, "embedding": self._embed(request["body"]["input"])}]}
+                else:
+                    body = {"choices": [{"index": 0, "message": {
+                        "role": "assistant",
+                        "content": self._summarize(request["body"]["messages"][-1]["content"]),
+                    }}]}
+                target.write(json.dumps({
+                    "id": f"{batch_id}_{request['custom_id']}",
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": body},
+                    "error": None,
+                }, ensure_ascii=False) + "\n")
+        os.replace(output_path + ".tmp", output_path)
+
+    @staticmethod
+    def _summarize(prompt: str) -> str:
+        text = prompt.split("텍스트:", 1)[-1].rsplit("JSON 응답:", 1)[0].strip()
+        words = [w for w in re.findall(r"\w+", text.lower()) if len(w) > 1]
+        keywords = [w for w, _ in Counter(words).most_common(5)]
+        return json.dumps({"summary": text[:200], "keywords": keywords, "main_topics": keywords[:2]}, ensure_ascii=False)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimensions] += 1
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+TRANSPORTS = {
+    OpenAIBatchTransport.name: OpenAIBatchTransport,
+    LocalBatchTransport.name: LocalBatchTransport,
+}
+
+async def submit_job(job_id: str, transport_name: str) -> Dict[str, Any]:
+    """아직 제출하지 않은 파일 제출 (중간에 실패해도 다시 실행하면 이어서 제출)"""
+    manifest = load_manifest(job_id)
+    if manifest["transport"] and manifest["transport"] != transport_name:
+        raise ValueError(f"job {job_id} was submitted with {manifest['transport']}")
+    transport = TRANSPORTS[transport_name]()
+    manifest["transport"] = transport_name
+    for entry in manifest["files"]:
+        if entry["batch_id"] is None:
+            input_path = os.path.join(job_dir(job_id), entry["input"])
+            entry["batch_id"] = await transport.submit(input_path, ENDPOINTS[manifest["kind"]])
+            entry["status"] = "submitted"
+            save_manifest(manifest)
+    save_manifest(manifest)
+    return manifest
+
+async def poll_job(job_id: str) -> Dict[str, Any]:
+    """제출된 배치 상태 갱신, 끝난 배치는 결과 파일 다운로드"""
+    manifest = load_manifest(job_id)
+    if not manifest["transport"]:
+        return manifest
+    transport = TRANSPORTS[manifest["transport"]]()
+    for entry in manifest["files"]:
+        if entry["batch_id"] is None or entry["status"] in TERMINAL_STATUSES:
+            continue
+        info = await transport.retrieve(entry["batch_id"])
+        if info["status"] in TERMINAL_STATUSES:
+            # 만료/취소된 배치도 처리된 부분의 결과는 받음
+            stem = entry["input"].replace("input-", "", 1)
+            for key, prefix in (("output_file_id", "output"), ("error_file_id", "errors")):
+                if info[key]:
+                    name = f"{prefix}-{stem}"
+                    await transport.download(info[key], os.path.join(job_dir(job_id), name))
+                    entry["output" if prefix == "output" else "errors"] = name
+        entry["status"] = info["status"]
+    save_manifest(manifest)
+    return manifest
+
+def is_finished(manifest: Dict[str, Any]) -> bool:
+    return all(entry["status"] in TERMINAL_STATUSES for entry in manifest["files"])
+
+# --- 결과 적용 ---
+
+def _read_results(path: str) -> Iterator[Tuple[int, str, Optional[Dict[str, Any]]]]:
+    """결과 JSONL 읽기. 반환: (note_id, 해시, 응답 본문 또는 실패 시 None)"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            note_id, _, key = record["custom_id"].partition(":")
+            response = record.get("response") or {}
+            ok = not record.get("error") and response.get("status_code") == 200
+            yield int(note_id), key, response.get("body") if ok else None
+
+def _pages(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _apply_summaries(db: Session, path: str, report: Dict[str, int]) -> None:
+    results = list(_read_results(path))
+    for page in _pages(results, settings.BATCH_APPLY_SIZE):
+        notes = {
+            note.id: note
+            for note in db.query(models.Note)
+                .options(selectinload(models.Note.tag_index))
+                .filter(models.Note.id.in_([note_id for note_id, _, _ in page]))
+                .all()
+        }
+        users = set()
+        for note_id, content_hash, body in page:
+            note = notes.get(note_id)
+            if body is None:
+                report["failed"] += 1
+            elif note is None or (note.content_hash or text_hash(note.content)) != content_hash:
+                report["stale"] += 1
+            else:
+                summary, keywords, topics = parse_summary(body["choices"][0]["message"]["content"])
+                note.summary = summary
+                if set_note_tags(note, keywords + topics):
+                    # 청크에 저장된 태그 갱신 (임베딩은 재사용)
+                    enqueue(db, note.id, note.user_id, RETAG)
+                users.add(note.user_id)
+                report["applied"] += 1
+        db.commit()
+        db.expunge_all()
+        # 캐시된 유사 노트 결과의 요약과 태그 필터 결과가 바뀜
+        for user_id in users:
+            similarity_cache.bump(user_id)
+
+async def _apply_embeddings(db: Session, path: str, report: Dict[str, int]) -> None:
+    # 결과 순서는 입력과 다를 수 있어서 파일 단위로 모은 뒤 노트별 적용
+    vectors: Dict[int, Dict[str, np.ndarray]] = {}
+    for note_id, chunk_hash, body in _read_results(path):
+        if body is None:
+            report["failed"] += 1
+            continue
+        vectors.setdefault(note_id, {})[chunk_hash] = np.asarray(body["data"][0]["embedding"], dtype=np.float32)
+
+    for page in _pages(sorted(vectors), settings.BATCH_APPLY_SIZE):
+        notes = {
+            note.id: note
+            for note in db.query(models.Note)
+                .options(selectinload(models.Note.chunks))
+                .filter(models.Note.id.in_(page))
+                .all()
+        }
+        for note_id in page:
+            note = notes.get(note_id)
+            if note is None:
+                report["stale"] += 1
+                continue
+            try:
+                await index_note(db, note, {h: v.tolist() for h, v in vectors.pop(note_id).items()})
+                report["applied"] += 1
+            except VectorSyncError as e:
+                # 내보낸 뒤 노트가 바뀌었거나 저장 실패 - outbox/reconcile이 처리
+                db.rollback()
+                print(f"Batch apply skipped note {note_id}: {e}")
+                report["stale"] += 1
+        db.expunge_all()
+
+async def apply_job(db: Session, job_id: str) -> Dict[str, int]:
+    """다운로드한 결과를 노트 요약/태그 또는 벡터 저장소에 일괄 반영
+
+    임베딩/요약 API를 호출하지 않으며, 내보낸 뒤 바뀐 노트의 결과는 건너뛴다.
+    """
+    manifest = load_manifest(job_id)
+    report = {"applied": 0, "stale": 0, "failed": 0}
+    for entry in manifest["files"]:
+        if entry["output"]:
+            path = os.path.join(job_dir(job_id), entry["output"])
+            if manifest["kind"] == SUMMARIZE:
+                _apply_summaries(db, path, report)
+            else:
+                await _apply_embeddings(db, path, report)
+        if entry["errors"]:
+            report["failed"] += sum(1 for _ in _read_results(os.path.join(job_dir(job_id), entry["errors"])))
+
+    manifest["applied_at"] = _now()
+    manifest["report"] = report
+    save_manifest(manifest)
+    return report
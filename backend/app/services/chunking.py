@@ -0,0 +1,151 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+@dataclass
+class Chunk:
+    index: int
+    title: str
+    text: str
+    hash: str
+
+    @property
+    def embedding_input(self) -> str:
+        """임베딩 API에 보낼 텍스트 (제목을 앞에 붙여 문맥 유지)"""
+        return f"{self.title}\n{self.text}"[:8000]
+
+def text_hash(*parts: str) -> str:
+    """여러 문자열을 구분자와 함께 sha256 해시"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def _split_long(paragraph: str, size: int) -> List[str]:
+    """청크 크기보다 긴 문단을 문장/공백 경계에서 자르기"""
+    pieces = []
+    while len(paragraph) > size:
+        cut = max(
+            paragraph.rfind(". ", 0, size),
+            paragraph.rfind("\n", 0, size),
+            paragraph.rfind(" ", 0, size),
+        )
+        # 경계가 너무 앞에 있으면 고정 길이로 자름
+        cut = cut + 1 if cut > size // 2 else size
+        pieces.append(paragraph[:cut].strip())
+        paragraph = paragraph[cut:].lstrip()
+    if paragraph:
+        pieces.append(paragraph)
+    return pieces
+
+def _tail(text: str, overlap: int) -> str:
+    """청크 끝 overlap 글자 이내를 문장(없으면 단어) 경계에서 잘라 반환"""
+    if overlap <= 0 or not text:
+        return ""
+    tail = text[-overlap:]
+    if len(text) <= overlap:
+        return tail.strip()
+    # 가장 앞쪽 문장 경계부터 (겹침을 최대한 길게), 없으면 단어 경계
+    for marker in (". ", "\n", " "):
+        pos = tail.find(marker)
+        if pos >= 0 and tail[pos + len(marker):].strip():
+            return tail[pos + len(marker):].strip()
+    return tail.strip()
+
+def split_into_chunks(
+    text: str,
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None
+) -> List[str]:
+    """텍스트를 문단 단위로 묶어 겹치는 구간(청크)으로 분할
+
+    경계를 문단 기준으로 정하기 때문에 노트 중간을 수정해도
+    앞뒤 청크의 내용(해시)은 그대로 유지된다.
+    각 청크는 앞 청크의 끝 overlap 글자 이내(문장/단어 경계)로 시작한다.
+    """
+    size = chunk_size or settings.CHUNK_SIZE
+    overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+
+    # (내용, 앞 단위와의 구분자) - 긴 문단을 자른 조각은 공백으로 이어 붙임
+    # 긴 문단은 이월된 꼬리가 들어갈 자리를 남기고 자름
+    piece_size = max(size - overlap - 1, size // 2)
+    units: List[Tuple[str, str]] = []
+    for paragraph in _PARAGRAPH_RE.split(text or ""):
+        paragraph = paragraph.strip()
+        if paragraph:
+            for i, piece in enumerate(_split_long(paragraph, piece_size)):
+                units.append((piece, " " if i else "\n\n"))
+
+    chunks = []
+    current = ""
+    for unit, separator in units:
+        if current and len(current) + len(separator) + len(unit) > size:
+            chunks.append(current)
+            # 앞 청크의 끝부분을 다음 청크로 이월
+            tail = _tail(current, overlap)
+            current = tail if tail and len(tail) + len(separator) + len(unit) <= size else ""
+        current = current + separator + unit if current else unit
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_chunks(title: str, content: str) -> List[Chunk]:
+    """노트를 청크 목록으로 변환 (같은 내용의 청크는 하나만 유지)"""
+    texts = split_into_chunks(content) or [""]
+    chunks: Dict[str, Chunk] = {}
+    for text in texts:
+        # 제목과 임베딩 모델이 바뀌면 벡터도 바뀌어야 하므로 해시에 포함
+        digest = text_hash(settings.EMBEDDING_MODEL, title, text)
+        if digest not in chunks:
+            chunks[digest] = Chunk(index=len(chunks), title=title, text=text, hash=digest)
+    return list(chunks.values())
+
+def pool_scores(scores: List[float], method: Optional[str] = None) -> float:
+    """청크 점수를 노트 점수로 합산 (max | mean)"""
+    method = method or settings.CHUNK_POOLING
+    if method == "mean":
+        return sum(scores) / len(scores)
+    return max(scores)
+
+def aggregate_chunk_hits(
+    hits: Iterable[Tuple[int, str, str, float]],
+    limit: int,
+    min_score: float,
+    pooling: Optional[str] = None
+) -> List[Tuple[int, str, str, float]]:
+    """청크 단위 검색 결과를 노트 단위로 묶기
+
+    hits: (note_id, title, passage, similarity)
+    반환: (note_id, title, 가장 유사한 passage, 노트 점수)
+    """
+    grouped: Dict[int, Tuple[str, str, float, List[float]]] = {}
+    for note_id, title, passage, score in hits:
+        if note_id not in grouped:
+            grouped[note_id] = (title, passage, score, [score])
+            continue
+        best_title, best_passage, best_score, scores = grouped[note_id]
+        scores.append(score)
+        if score > best_score:
+            grouped[note_id] = (best_title, passage, score, scores)
+
+    results = []
+    for note_id, (title, passage, _, scores) in grouped.items():
+        score = pool_scores(scores, pooling)
+        if score >= min_score:
+            results.append((note_id, title, passage, score))
+
+    results.sort(key=lambda x: x[3], reverse=True)
+    return results[:limit]
+
+def mean_vector(vectors: List[List[float]]) -> List[float]:
+    """청크 벡터 평균 (노트 대표 벡터)"""
+    if not vectors:
+        return []
+    count = len(vectors)
+    return [sum(values) / count for values in zip(*vectors)]
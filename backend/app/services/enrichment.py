@@ -0,0 +1,131 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.db import models
+from app.services.chunking import build_chunks, mean_vector, text_hash
+from app.services.openai_client import embed_texts
+from app.services.query_cache import similarity_cache
+from app.services.tags import normalize_tags
+from app.services.vector_store import vector_store
+
+class VectorSyncError(Exception):
+    """임베딩 또는 벡터 저장소 반영 실패 (outbox에서 재시도)"""
+
+def stamp_hashes(note: models.Note) -> None:
+    """현재 제목/내용 해시를 노트에 기록"""
+    note.title_hash = text_hash(note.title)
+    note.content_hash = text_hash(note.content)
+
+def detect_changes(
+    note: models.Note,
+    title: Optional[str],
+    content: Optional[str]
+) -> Tuple[bool, bool]:
+    """수정 요청이 실제로 제목/내용을 바꾸는지 해시로 판단
+
+    반환: (제목 변경 여부, 내용 변경 여부)
+    """
+    # 해시가 없는 기존 노트는 저장된 값으로 계산
+    title_changed = title is not None and \
+        text_hash(title) != (note.title_hash or text_hash(note.title))
+    content_changed = content is not None and \
+        text_hash(content) != (note.content_hash or text_hash(note.content))
+    return title_changed, content_changed
+
+async def sync_note_chunks(
+    db: Session,
+    note: models.Note,
+    vectors: Optional[Dict[str, List[float]]] = None,
+    retag: bool = False
+) -> Dict[str, List[float]]:
+    """노트 청크를 벡터 저장소와 동기화
+
+    청크 해시를 DB에 저장된 값과 비교해서 바뀐 청크만 다시 임베딩하고,
+    더 이상 없는 청크는 벡터 저장소에서 삭제한다.
+    검색 사전 필터용으로 정규화된 노트 태그를 새 청크마다 저장한다.
+    retag: 노트 태그가 바뀌었으면 True - 유지된 청크의 태그도 갱신 (Weaviate는 청크마다 update 요청)
+    vectors: 미리 계산된 {청크 해시: 벡터} (배치 작업 결과). 주어지면 임베딩 API를 호출하지 않는다.
+    반환: 새로 임베딩된 {청크 해시: 벡터}
+    실패 시 VectorSyncError (DB 청크 목록은 바뀌지 않아 재시도하면 같은 작업 반복)
+    """
+    chunks = build_chunks(note.title, note.content)
+    existing = {row.content_hash: row for row in note.chunks}
+    current_hashes = {chunk.hash for chunk in chunks}
+
+    changed = [chunk for chunk in chunks if chunk.hash not in existing]
+    stale = [h for h in existing if h not in current_hashes]
+    kept = len(existing) - len(stale)
+    tags = normalize_tags(note.tags)
+
+    embedded: Dict[str, List[float]] = {}
+    if changed:
+        if vectors is None:
+            new_vectors = await embed_texts([chunk.embedding_input for chunk in changed])
+        else:
+            new_vectors = [vectors[chunk.hash] for chunk in changed if chunk.hash in vectors]
+        if len(new_vectors) != len(changed):
+            raise VectorSyncError(f"embedding failed for note {note.id}")
+
+        stored = await vector_store.upsert_chunks(
+            note_id=note.id,
+            user_id=note.user_id,
+            chunks=list(zip(changed, new_vectors)),
+            tags=tags
+        )
+        if not stored:
+            raise VectorSyncError(f"chunk upsert failed for note {note.id}")
+        embedded = {chunk.hash: vector for chunk, vector in zip(changed, new_vectors)}
+
+    if stale and not await vector_store.delete_chunks(note.id, stale):
+        raise VectorSyncError(f"chunk delete failed for note {note.id}")
+    if retag and kept and not await vector_store.set_note_tags(note.id, tags):
+        raise VectorSyncError(f"chunk tag update failed for note {note.id}")
+
+    # DB의 청크 목록 갱신
+    for chunk_hash in stale:
+        note.chunks.remove(existing[chunk_hash])
+    for chunk in chunks:
+        row = existing.get(chunk.hash)
+        if row:
+            row.chunk_index = chunk.index
+        else:
+            note.chunks.append(models.NoteChunk(
+                chunk_index=chunk.index,
+                content_hash=chunk.hash
+            ))
+    db.commit()
+
+    # 사용자 검색 결과 캐시 무효화
+    similarity_cache.bump(note.user_id)
+    return embedded
+
+async def connect_similar_notes(db: Session, note: models.Note, vector: List[float]) -> None:
+    """노트 대표 벡터로 유사한 노트를 찾아 연결 생성"""
+    similar_results = await vector_store.search_similar(
+        vector=vector,
+        user_id=note.user_id,
+        limit=5,
+        min_score=0.7
+    )
+
+    for sim_note_id, _, _, sim_score in similar_results:
+        if sim_note_id != note.id:  # 자기 자신 제외
+            db.add(models.NoteConnection(
+                source_note_id=note.id,
+                target_note_id=sim_note_id,
+                similarity_score=sim_score
+            ))
+    db.commit()
+
+async def index_note(
+    db: Session,
+    note: models.Note,
+    vectors: Optional[Dict[str, List[float]]] = None,
+    retag: bool = False
+) -> None:
+    """노트 벡터 반영 + 처음 (전체) 임베딩된 노트면 유사 노트 연결"""
+    embedded = await sync_note_chunks(db, note, vectors, retag)
+    if not embedded or len(embedded) != len(note.chunks) or note.connections:
+        return
+    vector = mean_vector(list(embedded.values()))
+    if vector:
+        await connect_similar_notes(db, note, vector)
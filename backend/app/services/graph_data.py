@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Optional
+import orjson
+from sqlalchemy.orm import Session
+from app.db import models
+
+try:
+    import msgpack
+except ImportError:  # 선택 의존성
+    msgpack = None
+
+# Accept 헤더로 선택하는 압축 응답 형식
+COLUMNAR_JSON = "application/vnd.brainsxlm.graph+json"
+COLUMNAR_MSGPACK = "application/vnd.brainsxlm.graph+msgpack"
+
+def load_graph(db: Session, user_id: int, limit: int) -> Dict[str, Any]:
+    """그래프 데이터를 열(column) 단위 배열로 조회
+
+    노드는 정수 인덱스로, 엣지는 (source, target, weight) 병렬 배열로 표현한다.
+    ORM 객체 대신 필요한 컬럼만 두 번의 쿼리로 가져온다.
+    """
+    rows = db.query(models.Note.id, models.Note.title, models.Note.tags)\
+        .filter(models.Note.user_id == user_id)\
+        .order_by(models.Note.created_at.desc())\
+        .limit(limit)\
+        .all()
+
+    ids: List[int] = []
+    labels: List[str] = []
+    group_codes: List[int] = []
+    groups: Dict[str, int] = {}
+    for note_id, title, tags in rows:
+        group = tags[0] if tags else "default"
+        ids.append(note_id)
+        labels.append(title[:50])  # 제목 길이 제한
+        group_codes.append(groups.setdefault(group, len(groups)))
+
+    index = {note_id: i for i, note_id in enumerate(ids)}
+    degrees = [0] * len(ids)
+    sources: List[int] = []
+    targets: List[int] = []
+    weights: List[float] = []
+    seen_edges = set()
+
+    if ids:
+        connections = db.query(
+            models.NoteConnection.source_note_id,
+            models.NoteConnection.target_note_id,
+            models.NoteConnection.similarity_score
+        ).filter(models.NoteConnection.source_note_id.in_(ids)).all()
+
+        for source_id, target_id, score in connections:
+            degrees[index[source_id]] += 1
+            target = index.get(target_id)
+            if target is None:
+                continue
+            # 양방향 중복 방지
+            edge_key = (min(source_id, target_id), max(source_id, target_id))
+            if edge_key in seen_edges:
+                continue
+            seen_edges.add(edge_key)
+            sources.append(index[source_id])
+            targets.append(target)
+            weights.append(score)
+
+    return {
+        "nodes": {
+            "id": ids,
+            "label": labels,
+            "group": group_codes,
+            "degree": degrees,
+        },
+        "groups": list(groups),
+        "edges": {
+            "source": sources,
+            "target": targets,
+            "weight": weights,
+        },
+    }
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Accept 헤더에서 압축 형식 선택 (없으면 None = 기본 JSON)"""
+    if not accept:
+        return None
+    if COLUMNAR_MSGPACK in accept and msgpack is not None:
+        return COLUMNAR_MSGPACK
+    if COLUMNAR_JSON in accept or COLUMNAR_MSGPACK in accept:
+        return COLUMNAR_JSON
+    return None
+
+def encode(graph: Dict[str, Any], media_type: str) -> bytes:
+    """열 단위 그래프를 직렬화"""
+    if media_type == COLUMNAR_MSGPACK:
+        return msgpack.packb(graph, use_bin_type=True)
+    return orjson.dumps(graph)
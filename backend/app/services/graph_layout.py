@@ -0,0 +1,210 @@
+import hashlib
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import orjson
+from app.core.config import settings
+
+def graph_version(graph: Dict[str, Any]) -> str:
+    """노드/엣지 구성이 같으면 같은 값 (레이아웃 캐시 키)"""
+    payload = orjson.dumps([
+        graph["nodes"]["id"],
+        [graph["groups"][code] for code in graph["nodes"]["group"]],
+        graph["edges"]["source"],
+        graph["edges"]["target"],
+        [round(w, 3) for w in graph["edges"]["weight"]],
+    ])
+    return hashlib.sha1(payload).hexdigest()
+
+def detect_communities(
+    n: int,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    weights: np.ndarray,
+    iterations: int = 60,
+    seed: int = 0
+) -> np.ndarray:
+    """가중치 레이블 전파로 커뮤니티 검출
+
+    각 노드는 이웃 레이블 중 가중치 합이 가장 큰 것을 택한다 (자기 레이블에 약한 가중치를 둬 진동 방지).
+    반환: 크기 순으로 0부터 번호를 매긴 커뮤니티 ID
+    """
+    labels = np.arange(n)
+    if n == 0 or len(sources) == 0:
+        return labels
+
+    rng = np.random.default_rng(seed)
+    # 양방향 엣지 + 자기 자신
+    src = np.concatenate([sources, targets, np.arange(n)])
+    dst = np.concatenate([targets, sources, np.arange(n)])
+    w = np.concatenate([weights, weights, np.full(n, 1e-3)])
+
+    for _ in range(iterations):
+        # (노드, 이웃 레이블)별 가중치 합
+        keys = dst.astype(np.int64) * n + labels[src]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=w)
+        sums += rng.random(len(sums)) * 1e-6  # 동점 처리
+        nodes = unique_keys // n
+        candidates = unique_keys % n
+
+        # 노드별 최대 합 레이블 선택
+        order = np.lexsort((-sums, nodes))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = nodes[order][1:] != nodes[order][:-1]
+        best = order[first]
+        proposed = labels.copy()
+        proposed[nodes[best]] = candidates[best]
+        if np.array_equal(proposed, labels):
+            break
+
+        # 동시 갱신은 진동하므로 매번 절반만 갱신
+        update = rng.random(n) < 0.5
+        labels = np.where(update, proposed, labels)
+
+    # 큰 커뮤니티부터 0, 1, 2...
+    unique_labels, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.empty(len(unique_labels), dtype=np.int64)
+    rank[np.argsort(-counts, kind="stable")] = np.arange(len(unique_labels))
+    return rank[inverse]
+
+def force_layout(
+    n: int,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    weights: np.ndarray,
+    communities: np.ndarray,
+    iterations: int = 50,
+    seed: int = 0
+) -> np.ndarray:
+    """벡터화된 Fruchterman-Reingold 레이아웃
+
+    커뮤니티별로 원 위에 초기 배치한 뒤 반복한다. 반환: [0, 1] 범위 좌표 (n, 2)
+    """
+    if n == 0:
+        return np.zeros((0, 2), dtype=np.float32)
+    if n == 1:
+        return np.full((1, 2), 0.5, dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    cluster_count = int(communities.max()) + 1
+    angles = 2 * np.pi * communities / cluster_count
+    radius = 0.35 if cluster_count > 1 else 0.0
+    pos = np.stack([np.cos(angles), np.sin(angles)], axis=1) * radius
+    pos = (pos + rng.normal(scale=0.08, size=(n, 2))).astype(np.float32)
+
+    k = 1.0 / np.sqrt(n)
+    k2 = np.float32(k * k)
+    temperature = 0.1
+    block = 512
+    for step in range(iterations):
+        disp = np.zeros_like(pos)
+
+        # 척력 (블록 단위로 n x n 계산, x/y 분리해 float32 유지)
+        x = pos[:, 0]
+        y = pos[:, 1]
+        for start in range(0, n, block):
+            dx = x[start:start + block, None] - x[None, :]
+            dy = y[start:start + block, None] - y[None, :]
+            strength = k2 / (dx * dx + dy * dy + np.float32(1e-9))
+            disp[start:start + block, 0] += (dx * strength).sum(axis=1)
+            disp[start:start + block, 1] += (dy * strength).sum(axis=1)
+
+        # 인력 (엣지 가중치 비례)
+        if len(sources):
+            delta = pos[sources] - pos[targets]
+            dist = np.sqrt((delta ** 2).sum(axis=1)) + 1e-9
+            force = delta * (dist / k * weights)[:, None]
+            for axis in (0, 1):
+                disp[:, axis] -= np.bincount(sources, weights=force[:, axis], minlength=n).astype(np.float32)
+                disp[:, axis] += np.bincount(targets, weights=force[:, axis], minlength=n).astype(np.float32)
+
+        # 온도만큼만 이동
+        length = np.sqrt((disp ** 2).sum(axis=1)) + 1e-9
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature = 0.1 * (1 - (step + 1) / iterations) + 0.002
+
+    # [0, 1]로 정규화 (여백 5%)
+    low = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - low, 1e-6)
+    return 0.05 + 0.9 * (pos - low) / span
+
+def _community_groups(tag_groups: List[str], communities: np.ndarray) -> Tuple[List[int], List[str]]:
+    """커뮤니티를 이름 붙은 그룹으로 변환
+
+    이름은 구성 노드의 가장 흔한 태그이고, 같은 이름의 커뮤니티가 여럿이면 번호를 붙인다.
+    연결이 없는 단독 노드는 태그 이름 그룹으로 묶는다.
+    반환: (노드별 그룹 코드, 그룹 이름 목록)
+    """
+    community_count = int(communities.max()) + 1 if len(communities) else 0
+    sizes = np.bincount(communities, minlength=community_count)
+    used = Counter()
+    community_names = []
+    for community in range(community_count):
+        members = [tag_groups[i] for i in np.nonzero(communities == community)[0]]
+        name = Counter(members).most_common(1)[0][0]
+        if sizes[community] > 1:
+            used[name] += 1
+            if used[name] > 1:
+                name = f"{name} #{used[name]}"
+        community_names.append(name)
+
+    names: Dict[str, int] = {}
+    codes = [names.setdefault(community_names[c], len(names)) for c in communities.tolist()]
+    return codes, list(names)
+
+def compute_layout(graph: Dict[str, Any]) -> Dict[str, List]:
+    """커뮤니티 + 좌표 계산"""
+    nodes = graph["nodes"]
+    edges = graph["edges"]
+    n = len(nodes["id"])
+    sources = np.asarray(edges["source"], dtype=np.int64)
+    targets = np.asarray(edges["target"], dtype=np.int64)
+    weights = np.asarray(edges["weight"], dtype=np.float32)
+
+    communities = detect_communities(n, sources, targets, weights)
+    iterations = 50 if n <= 1000 else 30
+    positions = force_layout(n, sources, targets, weights, communities, iterations=iterations)
+    tag_groups = [graph["groups"][code] for code in nodes["group"]]
+    codes, names = _community_groups(tag_groups, communities)
+
+    # float32를 그대로 반올림하면 tolist()에서 0.12340000271797180 같은 값이 되므로 float64로 변환 후 반올림
+    positions = positions.astype(np.float64)
+    return {
+        "cluster": codes,
+        "names": names,
+        "x": np.round(positions[:, 0], 4).tolist(),
+        "y": np.round(positions[:, 1], 4).tolist(),
+    }
+
+class LayoutCache:
+    """그래프 버전별 레이아웃 LRU 캐시"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, List]]" = OrderedDict()
+
+    def get_or_compute(self, graph: Dict[str, Any]) -> Dict[str, List]:
+        version = graph_version(graph)
+        layout = self._entries.get(version)
+        if layout is None:
+            layout = compute_layout(graph)
+            self._entries[version] = layout
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(version)
+        return layout
+
+layout_cache = LayoutCache(settings.GRAPH_LAYOUT_CACHE_SIZE)
+
+def apply_layout(graph: Dict[str, Any]) -> Dict[str, Any]:
+    """열 단위 그래프에 좌표(x, y)와 커뮤니티 그룹을 추가
+
+    group은 첫 번째 태그 대신 연결 구조로 찾은 커뮤니티를 가리킨다.
+    """
+    layout = layout_cache.get_or_compute(graph)
+    graph["nodes"]["x"] = layout["x"]
+    graph["nodes"]["y"] = layout["y"]
+    graph["nodes"]["group"] = layout["cluster"]
+    graph["groups"] = layout["names"]
+    return graph
@@ -0,0 +1,635 @@
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.services.ann_index import IVFIndex
+from app.services.quantization import make_quantizer, normalize, truncate
+
+try:
+    import fcntl
+except ImportError:  # Windows - 잠금 없이 동작
+    fcntl = None
+
+# 행 메타데이터는 고정 폭 UTF-8 바이트 열로 memmap 파일에 저장
+HASH_BYTES = 64
+TITLE_BYTES = 256
+PASSAGE_BYTES = 600  # 200자 (한글 3바이트)
+PASSAGE_CHARS = 200
+
+# 속성 이름: (파일, dtype) - 원본 벡터 외의 memmap 열
+_TEXT_COLUMNS = {
+    "hashes": ("hashes.bin", f"S{HASH_BYTES}"),
+    "titles": ("titles.bin", f"S{TITLE_BYTES}"),
+    "passages": ("passages.bin", f"S{PASSAGE_BYTES}"),
+}
+
+class IndexLockedError(RuntimeError):
+    """다른 프로세스가 같은 로컬 인덱스 디렉토리를 사용 중"""
+
+def _atomic_write(path: str, write) -> None:
+    """임시 파일에 쓴 뒤 교체 (memmap으로 열려 있는 파일도 안전)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def _fixed(text: str, width: int) -> bytes:
+    """UTF-8로 인코딩해 width 바이트 이하로 자르기 (글자 중간에서 자르지 않음)"""
+    return text.encode("utf-8")[:width].decode("utf-8", "ignore").encode("utf-8")
+
+def _text(value: bytes) -> str:
+    return value.decode("utf-8", "ignore")
+
+def _tag_key(tag: str) -> int:
+    """정규화된 태그의 64비트 해시 (0은 삭제 표시로 사용)"""
+    key = int.from_bytes(hashlib.blake2b(tag.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+    return key or 1
+
+class LocalVectorIndex:
+    """Weaviate 없이 동작하는 로컬 청크 벡터 인덱스 (NumPy)
+
+    - 원본 float32 벡터는 디스크의 memmap 파일에 두고 (RAM 상주 X)
+    - 청크 해시/제목/본문 일부도 고정 폭 memmap 열로 두어 시작 시 파싱하지 않음
+    - 메모리에는 Matryoshka 차원 축소 + 양자화된 코드만 유지
+    - 코드로 후보를 고른 뒤 원본 벡터로 재채점
+    - 행이 많으면 IVF 인덱스로 일부 리스트만 탐색 (LOCAL_INDEX_ANN)
+      IVF 학습은 build_ivf/install_ivf로 나눠 호출하는 쪽에서 스레드로 돌린다.
+    - 태그 필터용으로 (행, 태그 해시) 쌍 배열을 두고 검색 시 행 마스크로 변환
+    - 한 디렉토리는 한 프로세스만 열 수 있다 (load에서 index.lock 배타 잠금).
+      각자 메모리의 count 뒤에 이어 쓰고 flush 때 서로의 메타데이터를 덮어쓰기 때문.
+      API 서버가 실행 중이면 CLI는 outbox를 쌓고 서버 작업자가 반영하게 해야 한다.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        quantization: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        pq_subvectors: Optional[int] = None,
+        rerank: Optional[int] = None,
+        ann: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        ann_min_rows: Optional[int] = None
+    ):
+        self.path = path
+        self.quantization = quantization or settings.LOCAL_INDEX_QUANTIZATION
+        self.code_dimensions = dimensions if dimensions is not None else settings.LOCAL_INDEX_DIMENSIONS
+        self.pq_subvectors = pq_subvectors or settings.LOCAL_INDEX_PQ_SUBVECTORS
+        self.rerank = rerank or settings.LOCAL_INDEX_RERANK
+        ann = ann or settings.LOCAL_INDEX_ANN
+        self.ivf = IVFIndex(nprobe=nprobe, min_rows=ann_min_rows) if ann == "ivf" else None
+
+        self.dimensions = 0  # 원본 벡터 차원 (첫 삽입 시 결정)
+        self.count = 0
+        self.capacity = 0
+        self.quantizer = None
+        self._vectors = None
+        self.codes = None
+        self.note_ids = np.zeros(0, dtype=np.int64)
+        self.user_ids = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.hashes = None
+        self.titles = None
+        self.passages = None
+        self._generation = 0  # compact 때마다 증가 (학습 중 행 번호가 바뀌었는지 확인)
+        self.live = 0  # 삭제되지 않은 행 수
+        # (행, 태그 해시) 쌍 - 태그가 바뀌면 기존 쌍의 키를 0으로 지우고 새로 추가
+        self.tag_rows = np.zeros(0, dtype=np.int64)
+        self.tag_keys = np.zeros(0, dtype=np.int64)
+        self.tag_count = 0
+        self._pending_writes = 0
+        self._lock_file = None
+
+    # ---- 파일 ----
+
+    @property
+    def _arrays_file(self) -> str:
+        return os.path.join(self.path, "index.npz")
+
+    @property
+    def _codes_file(self) -> str:
+        return os.path.join(self.path, "codes.npy")
+
+    @property
+    def _meta_file(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _open_memmap(self, file_name: str, dtype, shape: Tuple[int, ...]) -> np.memmap:
+        """memmap 열기 (필요하면 파일 크기 확장)"""
+        path = os.path.join(self.path, file_name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open_vectors(self, capacity: int) -> None:
+        """원본 벡터와 메타데이터 열 memmap 열기"""
+        if self._vectors is not None:
+            self._flush_columns()
+        self._vectors = self._open_memmap("vectors.f32", np.float32, (capacity, self.dimensions))
+        for name, (file_name, dtype) in _TEXT_COLUMNS.items():
+            setattr(self, name, self._open_memmap(file_name, dtype, (capacity,)))
+
+    def _flush_columns(self) -> None:
+        self._vectors.flush()
+        for name in _TEXT_COLUMNS:
+            getattr(self, name).flush()
+
+    def _lock(self) -> None:
+        """디렉토리 배타 잠금 (이미 잠겨 있으면 IndexLockedError)"""
+        if fcntl is None or self._lock_file is not None:
+            return
+        lock_file = open(os.path.join(self.path, "index.lock"), "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.seek(0)
+            owner = lock_file.read().strip() or "?"
+            lock_file.close()
+            raise IndexLockedError(f"local vector index {self.path} is in use by another process (pid {owner})")
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._lock_file = lock_file
+
+    def close(self) -> None:
+        """저장 후 잠금 해제"""
+        try:
+            self.flush()
+        finally:
+            if self._lock_file is not None:
+                self._lock_file.close()  # 파일을 닫으면 flock도 풀림
+                self._lock_file = None
+
+    def load(self) -> "LocalVectorIndex":
+        """디스크에서 인덱스 불러오기 (없으면 빈 인덱스)
+
+        디렉토리를 잠그므로 다 쓰면 close()를 호출한다.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        self._lock()
+        if not os.path.exists(self._meta_file):
+            return self
+
+        with open(self._meta_file, encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = np.load(self._arrays_file)
+
+        self.dimensions = meta["dimensions"]
+        self.count = meta["count"]
+        self.quantization = meta["quantization"]
+        self.code_dimensions = meta["code_dimensions"]
+        self.pq_subvectors = meta.get("pq_subvectors", self.pq_subvectors)
+
+        self.capacity = self.count
+        self.note_ids = arrays["note_ids"]
+        self.user_ids = arrays["user_ids"]
+        self.alive = arrays["alive"]
+        self.quantizer = self._new_quantizer()
+        if os.path.exists(self._codes_file):
+            # 코드는 memmap으로 열어 바로 검색 가능 (쓰기 시 메모리로 복사)
+            self.codes = np.load(self._codes_file, mmap_mode="r")
+            self.quantizer.load_state({
+                key[len("q_"):]: arrays[key] for key in arrays.files if key.startswith("q_")
+            })
+        if "tag_rows" in arrays.files:
+            self.tag_rows = arrays["tag_rows"]
+            self.tag_keys = arrays["tag_keys"]
+            self.tag_count = len(self.tag_rows)
+        if self.ivf is not None and "ivf_centroids" in arrays.files:
+            self.ivf.load_state({
+                key[len("ivf_"):]: arrays[key] for key in arrays.files if key.startswith("ivf_")
+            })
+        if self.capacity:
+            self._open_vectors(self.capacity)
+        if "hashes" in meta:
+            # 이전 형식 (meta.json에 목록 저장) -> 열 파일로 옮김
+            self.hashes[:] = [_fixed(h, HASH_BYTES) for h in meta["hashes"]]
+            self.titles[:] = [_fixed(t, TITLE_BYTES) for t in meta["titles"]]
+            self.passages[:] = [_fixed(p, PASSAGE_BYTES) for p in meta["passages"]]
+            self.flush()
+
+        self.live = int(self.alive[:self.count].sum())
+        return self
+
+    def flush(self) -> None:
+        """메타데이터/코드 저장 (원본 벡터는 memmap이 직접 기록)"""
+        if self._vectors is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        if self._dead_ratio() > 0.25:
+            self.compact()
+        self._flush_columns()
+
+        arrays = {
+            "note_ids": self.note_ids[:self.count],
+            "user_ids": self.user_ids[:self.count],
+            "alive": self.alive[:self.count],
+            "tag_rows": self.tag_rows[:self.tag_count],
+            "tag_keys": self.tag_keys[:self.tag_count],
+        }
+        if self.codes is not None and self.quantizer.trained:
+            codes = self.codes[:self.count]
+            _atomic_write(self._codes_file, lambda f: np.save(f, codes))
+            arrays.update({f"q_{k}": v for k, v in self.quantizer.state().items()})
+        if self.ivf is not None:
+            arrays.update({f"ivf_{k}": v for k, v in self.ivf.state().items()})
+        _atomic_write(self._arrays_file, lambda f: np.savez(f, **arrays))
+
+        meta = json.dumps({
+                "dimensions": self.dimensions,
+                "count": self.count,
+                "quantization": self.quantization,
+                "code_dimensions": self.code_dimensions,
+                "pq_subvectors": self.pq_subvectors,
+            })
+        _atomic_write(self._meta_file, lambda f: f.write(meta.encode("utf-8")))
+        self._pending_writes = 0
+
+    def _maybe_flush(self, writes: int) -> None:
+        self._pending_writes += writes
+        if self._pending_writes >= settings.LOCAL_INDEX_FLUSH_EVERY:
+            self.flush()
+
+    # ---- 내부 상태 ----
+
+    def _new_quantizer(self):
+        width = self.code_dimensions or self.dimensions
+        return make_quantizer(self.quantization, min(width, self.dimensions), self.pq_subvectors)
+
+    def _code_input(self, vectors: np.ndarray) -> np.ndarray:
+        return truncate(vectors, self.code_dimensions or self.dimensions)
+
+    def _dead_ratio(self) -> float:
+        if not self.count:
+            return 0.0
+        return 1.0 - self.live / self.count
+
+    def _grow(self, needed: int) -> None:
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, 1024)
+        extra = capacity - self.capacity
+        self.note_ids = np.concatenate([self.note_ids, np.zeros(extra, dtype=np.int64)])
+        self.user_ids = np.concatenate([self.user_ids, np.zeros(extra, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        if self.codes is not None:
+            padding = np.zeros((extra,) + self.codes.shape[1:], dtype=self.codes.dtype)
+            self.codes = np.concatenate([self.codes[:self.capacity], padding])
+        self.capacity = capacity
+        self._open_vectors(capacity)
+
+    @staticmethod
+    def _writable(array: np.ndarray) -> np.ndarray:
+        """읽기 전용 memmap이면 메모리로 복사"""
+        return array if array.flags.writeable else np.array(array)
+
+    def _train(self) -> None:
+        """충분한 벡터가 모이면 양자화기 학습 후 전체 인코딩"""
+        rows = np.nonzero(self.alive[:self.count])[0]
+        if len(rows) < self.quantizer.min_train:
+            return
+        sample = rows
+        if len(rows) > 20000:
+            sample = np.sort(np.random.default_rng(0).choice(rows, 20000, replace=False))
+        self.quantizer.train(self._code_input(self._vectors[sample]))
+        self._encode_all()
+
+    def _encode_all(self) -> None:
+        codes = [
+            self.quantizer.encode(self._code_input(self._vectors[start:min(start + 4096, self.count)]))
+            for start in range(0, self.count, 4096)
+        ]
+        encoded = np.concatenate(codes) if codes else np.zeros((0, 0), dtype=np.uint8)
+        self.codes = np.zeros((self.capacity,) + encoded.shape[1:], dtype=encoded.dtype)
+        self.codes[:self.count] = encoded
+
+    def compact(self) -> None:
+        """삭제된 행 제거 후 재배치"""
+        rows = np.nonzero(self.alive[:self.count])[0]
+        count = len(rows)
+        self._vectors[:count] = self._vectors[rows]
+        self.note_ids[:count] = self.note_ids[rows]
+        self.user_ids[:count] = self.user_ids[rows]
+        self.alive[:count] = True
+        self.alive[count:] = False
+        if self.codes is not None:
+            self.codes = self._writable(self.codes)
+            self.codes[:count] = self.codes[rows]
+        if self.ivf is not None:
+            self.ivf.remap(rows)
+        for name in _TEXT_COLUMNS:
+            column = getattr(self, name)
+            column[:count] = column[rows]
+
+        # 태그 쌍: 삭제된 행/지워진 키 제거 후 행 번호 변환
+        new_row = np.full(self.count, -1, dtype=np.int64)
+        new_row[rows] = np.arange(count)
+        tag_rows = self.tag_rows[:self.tag_count]
+        keep = (self.tag_keys[:self.tag_count] != 0) & (new_row[tag_rows] >= 0)
+        self.tag_rows = new_row[tag_rows[keep]]
+        self.tag_keys = self.tag_keys[:self.tag_count][keep]
+        self.tag_count = len(self.tag_rows)
+        self.count = count
+        self._generation += 1
+
+    # ---- 공개 API ----
+
+    def __len__(self) -> int:
+        return self.live
+
+    def add(
+        self,
+        items: List[Tuple[int, int, str, str, str, List[float]]],
+        tags: Sequence[str] = ()
+    ) -> None:
+        """청크 벡터 추가 (note_id, user_id, chunk_hash, title, passage, vector)
+
+        tags: 추가하는 청크 모두에 붙일 정규화된 태그
+        """
+        if not items:
+            return
+        vectors = normalize(np.asarray([item[5] for item in items], dtype=np.float32))
+        if not self.dimensions:
+            self.dimensions = vectors.shape[1]
+            self.quantizer = self._new_quantizer()
+            self.capacity = 0
+            self._grow(len(items))
+
+        # 같은 키가 있으면 교체
+        self.remove_keys([(item[0], item[2]) for item in items])
+
+        start = self.count
+        self._grow(start + len(items))
+        end = start + len(items)
+        self._vectors[start:end] = vectors
+        self.note_ids[start:end] = [item[0] for item in items]
+        self.user_ids[start:end] = [item[1] for item in items]
+        self.alive[start:end] = True
+        self.hashes[start:end] = [_fixed(item[2], HASH_BYTES) for item in items]
+        self.titles[start:end] = [_fixed(item[3], TITLE_BYTES) for item in items]
+        self.passages[start:end] = [_fixed(item[4][:PASSAGE_CHARS], PASSAGE_BYTES) for item in items]
+        self.count = end
+        self.live += len(items)
+        self._add_tags(np.arange(start, end), tags)
+
+        if self.quantizer.trained and self.codes is not None:
+            self.codes = self._writable(self.codes)
+            self.codes[start:end] = self.quantizer.encode(self._code_input(vectors))
+        elif not self.quantizer.trained:
+            self._train()
+        elif self.codes is None:
+            self._encode_all()
+
+        if self.ivf is not None:
+            # 학습은 ivf_training_due를 보고 호출하는 쪽에서 따로 수행 (그동안 기존 리스트로 검색)
+            self.ivf.add(self._code_input(vectors), np.arange(start, end))
+
+        self._maybe_flush(len(items))
+
+    def ivf_training_due(self) -> bool:
+        """IVF를 (재)학습할 때가 됐는지"""
+        return self.ivf is not None and self.ivf.needs_training(self.live)
+
+    def build_ivf(self) -> Tuple[IVFIndex, int, int]:
+        """현재 행으로 새 IVF 학습 (스레드에서 실행 가능, 인덱스 상태는 바꾸지 않음)
+
+        반환: (새 IVF, 학습에 포함된 행 수, 학습 시작 시점의 generation)
+        """
+        count, generation, vectors = self.count, self._generation, self._vectors
+        rows = np.nonzero(self.alive[:count])[0]
+        sample = rows
+        if len(rows) > 50000:
+            sample = np.sort(np.random.default_rng(0).choice(rows, 50000, replace=False))
+        ivf = IVFIndex(nlist=self.ivf.nlist, nprobe=self.ivf.nprobe, min_rows=self.ivf.min_rows)
+        ivf.train(self._code_input(np.asarray(vectors[sample])), len(rows))
+        for start in range(0, len(rows), 4096):
+            block = rows[start:start + 4096]
+            ivf.add(self._code_input(np.asarray(vectors[block])), block)
+        return ivf, count, generation
+
+    def install_ivf(self, built: Tuple[IVFIndex, int, int]) -> bool:
+        """build_ivf 결과로 교체 (학습 중 추가된 행은 여기서 배정)
+
+        학습 중 compact로 행 번호가 바뀌었으면 버리고 False 반환.
+        """
+        ivf, count, generation = built
+        if generation != self._generation:
+            return False
+        if count < self.count:
+            rows = np.arange(count, self.count)
+            rows = rows[self.alive[rows]]
+            ivf.add(self._code_input(np.asarray(self._vectors[rows])), rows)
+        self.ivf = ivf
+        return True
+
+    def train_ivf(self) -> None:
+        """IVF 학습 (동기 실행 - CLI/벤치마크용)"""
+        self.install_ivf(self.build_ivf())
+
+    def _add_tags(self, rows: np.ndarray, tags: Sequence[str]) -> None:
+        keys = np.array(sorted({_tag_key(tag) for tag in tags}), dtype=np.int64)
+        if not len(keys) or not len(rows):
+            return
+        needed = self.tag_count + len(rows) * len(keys)
+        if needed > len(self.tag_rows):
+            extra = max(needed, len(self.tag_rows) * 2, 1024) - len(self.tag_rows)
+            self.tag_rows = np.concatenate([self.tag_rows, np.zeros(extra, dtype=np.int64)])
+            self.tag_keys = np.concatenate([self.tag_keys, np.zeros(extra, dtype=np.int64)])
+        self.tag_rows[self.tag_count:needed] = np.repeat(rows, len(keys))
+        self.tag_keys[self.tag_count:needed] = np.tile(keys, len(rows))
+        self.tag_count = needed
+
+    def set_note_tags(self, note_id: int, tags: Sequence[str]) -> None:
+        """노트의 모든 청크 태그 교체"""
+        rows = self._note_rows([note_id])
+        if not len(rows):
+            return
+        self.tag_keys = self._writable(self.tag_keys)
+        self.tag_keys[:self.tag_count][np.isin(self.tag_rows[:self.tag_count], rows)] = 0
+        self._add_tags(rows, tags)
+        self._compact_tags()
+        self._maybe_flush(len(rows))
+
+    def _compact_tags(self) -> None:
+        """지워진 키와 삭제된 행의 태그 쌍이 절반을 넘으면 제거 (행 compact를 기다리지 않음)"""
+        if self.tag_count < 1024:
+            return
+        keep = (self.tag_keys[:self.tag_count] != 0) & self.alive[self.tag_rows[:self.tag_count]]
+        if keep.sum() * 2 >= self.tag_count:
+            return
+        self.tag_rows = self.tag_rows[:self.tag_count][keep]
+        self.tag_keys = self.tag_keys[:self.tag_count][keep]
+        self.tag_count = len(self.tag_rows)
+
+    def _tag_mask(self, tags: Sequence[str]) -> np.ndarray:
+        """모든 태그를 가진 행 = True (행 수 길이)"""
+        keys = {_tag_key(tag) for tag in tags}
+        matched = np.zeros(self.count, dtype=np.int32)
+        tag_rows = self.tag_rows[:self.tag_count]
+        tag_keys = self.tag_keys[:self.tag_count]
+        for key in keys:
+            matched[tag_rows[tag_keys == key]] += 1
+        return matched == len(keys)
+
+    def _note_rows(self, note_ids: Sequence[int]) -> np.ndarray:
+        """노트들의 살아 있는 행 번호 (키 -> 행 dict 대신 note_ids 배열을 스캔)"""
+        if not self.count or not len(note_ids):
+            return np.zeros(0, dtype=np.int64)
+        wanted = np.asarray(list(note_ids), dtype=self.note_ids.dtype)
+        return np.nonzero(self.alive[:self.count] & np.isin(self.note_ids[:self.count], wanted))[0]
+
+    def keys(self) -> List[Tuple[int, str]]:
+        """저장된 (note_id, chunk_hash) 목록"""
+        if not self.live:
+            return []
+        rows = np.nonzero(self.alive[:self.count])[0]
+        return [
+            (int(note_id), _text(chunk_hash))
+            for note_id, chunk_hash in zip(self.note_ids[rows], self.hashes[rows])
+        ]
+
+    def remove_keys(self, keys: List[Tuple[int, str]]) -> int:
+        """(note_id, chunk_hash) 단위 삭제"""
+        wanted = {(note_id, _fixed(chunk_hash, HASH_BYTES)) for note_id, chunk_hash in keys}
+        rows = self._note_rows({note_id for note_id, _ in wanted})
+        if not len(rows):
+            return 0
+        rows = [
+            row for row, note_id, chunk_hash in zip(rows, self.note_ids[rows], self.hashes[rows])
+            if (int(note_id), chunk_hash) in wanted
+        ]
+        return self._remove_rows(rows)
+
+    def remove_note(self, note_id: int) -> int:
+        """노트의 모든 청크 삭제"""
+        return self._remove_rows(self._note_rows([note_id]))
+
+    def _remove_rows(self, rows) -> int:
+        if not len(rows):
+            return 0
+        self.alive[rows] = False
+        self.live -= len(rows)
+        self._maybe_flush(len(rows))
+        return len(rows)
+
+    def note_vectors(self, note_id: int) -> np.ndarray:
+        """노트의 원본 청크 벡터"""
+        rows = self._note_rows([note_id])
+        return np.asarray(self._vectors[rows]) if len(rows) else np.zeros((0, self.dimensions))
+
+    def chunk_vectors(self, note_ids: Sequence[int]) -> Dict[int, Dict[str, np.ndarray]]:
+        """노트별 {청크 해시: 원본 벡터}"""
+        rows = self._note_rows(note_ids)
+        if not len(rows):
+            return {}
+        vectors = np.asarray(self._vectors[rows])
+        result: Dict[int, Dict[str, np.ndarray]] = {}
+        for vector, note_id, chunk_hash in zip(vectors, self.note_ids[rows], self.hashes[rows]):
+            result.setdefault(int(note_id), {})[_text(chunk_hash)] = vector
+        return result
+
+    def _candidate_rows(
+        self,
+        user_id: Optional[int],
+        note_ids: Optional[np.ndarray] = None,
+        tag_mask: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        mask = self.alive[:self.count]
+        if user_id:
+            mask = mask & (self.user_ids[:self.count] == user_id)
+        if note_ids is not None:
+            mask = mask & np.isin(self.note_ids[:self.count], note_ids)
+        if tag_mask is not None:
+            mask = mask & tag_mask
+        return np.nonzero(mask)[0]
+
+    def search(
+        self,
+        vector: List[float],
+        user_id: Optional[int] = None,
+        k: int = 20,
+        note_ids: Optional[Sequence[int]] = None,
+        tags: Optional[Sequence[str]] = None
+    ) -> List[Tuple[int, str, str, float]]:
+        """청크 단위 유사도 검색 (note_id, title, passage, score)
+
+        note_ids: 이 노트들의 청크만 검색
+        tags: 이 (정규화된) 태그를 모두 가진 청크만 검색
+        """
+        if not self.live:
+            return []
+        allowed = None
+        if note_ids is not None:
+            allowed = np.asarray(note_ids, dtype=self.note_ids.dtype)
+            if not len(allowed):
+                return []
+        tag_mask = None
+        if tags:
+            tag_mask = self._tag_mask(tags)
+            if not tag_mask.any():
+                return []
+        query = normalize(np.asarray(vector, dtype=np.float32)[:self.dimensions])
+        code_query = self._code_input(query)
+        candidates = k * self.rerank
+
+        rows = None
+        if self.ivf is not None and self.ivf.trained:
+            # IVF: 가까운 리스트의 행만 탐색
+            rows = self.ivf.probe(code_query)
+            mask = self.alive[rows]
+            if user_id:
+                mask &= self.user_ids[rows] == user_id
+            if allowed is not None:
+                mask &= np.isin(self.note_ids[rows], allowed)
+            if tag_mask is not None:
+                mask &= tag_mask[rows]
+            rows = rows[mask]
+            if len(rows) < candidates:
+                # 사용자 노트가 적어 후보가 부족하면 전체 스캔
+                rows = None
+        if rows is None:
+            rows = self._candidate_rows(user_id, allowed, tag_mask)
+        if not len(rows):
+            return []
+
+        # 1단계: 양자화 코드로 후보 선정
+        if self.quantizer.trained and self.codes is not None and len(rows) > candidates:
+            approx = self.quantizer.scores(code_query, self.codes[rows])
+            rows = rows[np.argpartition(-approx, candidates)[:candidates]]
+
+        # 2단계: 원본 벡터로 재채점
+        rows = np.sort(rows)
+        exact = np.asarray(self._vectors[rows]) @ query
+        order = np.argsort(-exact)[:k]
+
+        return [
+            (
+                int(self.note_ids[rows[i]]),
+                _text(self.titles[rows[i]]),
+                _text(self.passages[rows[i]]),
+                float(exact[i])
+            )
+            for i in order
+        ]
+
+    def memory_bytes(self) -> int:
+        """RAM에 상주하는 검색용 데이터 크기
+
+        힙에 있는 배열(할당된 용량 기준) + 코드와 코드북 + IVF 리스트.
+        해시/제목/본문 열과 원본 벡터는 memmap이라 페이지 캐시에만 올라가므로 제외하되,
+        양자화 학습 전에는 검색이 원본 벡터를 전부 읽으므로 포함한다.
+        """
+        total = self.note_ids.nbytes + self.user_ids.nbytes + self.alive.nbytes
+        total += self.tag_rows.nbytes + self.tag_keys.nbytes
+        if self.codes is not None and self.quantizer.trained:
+            total += self.codes.nbytes
+            total += sum(np.asarray(value).nbytes for value in self.quantizer.state().values())
+        else:
+            total += self.count * self.dimensions * 4
+        if self.ivf is not None:
+            total += self.ivf.memory_bytes()
+        return total
@@ -1,6 +1,7 @@
+import asyncio
 import json
 import re
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 from openai import AsyncOpenAI
 from app.core.config import settings
 
@@ -8,7 +9,7 @@ from app.core.config import settings
 client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
 async def embed_text(text: str) -> List[float]:
-    """텍스트를 벡터로 임베딩"""
+    """텍스트를 벡터로 임베딩 (실패 시 빈 리스트)"""
     try:
         response = await client.embeddings.create(
             model=settings.EMBEDDING_MODEL,
@@ -17,13 +18,36 @@ async def embed_text(text: str) -> List[float]:
         return response.data[0].embedding
     except Exception as e:
         print(f"Embedding error: {e}")
-        # 에러 시 더미 임베딩 반환 (실제론 재시도 로직 필요)
-        return [0.0] * 1536  # text-embedding-3-small의 차원
+        # 더미 벡터로 검색하면 빈 결과가 캐시되므로 실패를 그대로 알림
+        return []
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """여러 텍스트를 배치로 임베딩 (실패 시 빈 리스트)"""
+    if not texts:
+        return []
+
+    batch_size = settings.EMBEDDING_BATCH_SIZE
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    async def _embed_batch(batch: List[str]) -> List[List[float]]:
+        response = await client.embeddings.create(
+            model=settings.EMBEDDING_MODEL,
+            input=[text[:8000] for text in batch]
+        )
+        # 응답 순서가 입력 순서와 다를 수 있으므로 index로 정렬
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
 
-async def summarize_and_keywords(text: str) -> Tuple[str, List[str], List[str]]:
-    """텍스트 요약, 키워드, 주제 추출"""
     try:
-        prompt = f"""
+        results = await asyncio.gather(*[_embed_batch(batch) for batch in batches])
+        return [vector for batch in results for vector in batch]
+    except Exception as e:
+        print(f"Batch embedding error: {e}")
+        # 더미 벡터를 저장하면 재시도되지 않으므로 빈 결과 반환
+        return []
+
+def summary_request(text: str) -> Dict[str, Any]:
+    """요약/키워드 추출 요청 본문 (실시간 호출과 배치 작업이 같은 프롬프트 사용)"""
+    prompt = f"""
 다음 텍스트를 분석하여 JSON 형식으로 응답해주세요:
 1. summary: 핵심 내용 2-3문장 요약
 2. keywords: 핵심 키워드 5-7개
@@ -33,41 +57,76 @@ async def summarize_and_keywords(text: str) -> Tuple[str, List[str], List[str]]:
 {text[:3000]}
 
 JSON 응답:
+"""
+    return {
+        "model": settings.GPT_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that analyzes text and returns JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "response_format": {"type": "json_object"}
+    }
+
+def parse_summary(content: str) -> Tuple[str, List[str], List[str]]:
+    """요약 응답 파싱. 반환: (요약, 키워드, 주제)"""
+    try:
+        data = json.loads(content)
+        summary = data.get("summary", "")
+        keywords = data.get("keywords", [])
+        topics = data.get("main_topics", [])
+        return summary, keywords, topics
+    except json.JSONDecodeError:
+        # 파싱 실패 시 정규식으로 추출 시도
+        summary = re.search(r'"summary":\s*"([^"]+)"', content)
+        summary = summary.group(1) if summary else "요약을 생성할 수 없습니다."
+        return summary, [], []
+
+async def summarize_and_keywords(text: str) -> Tuple[str, List[str], List[str]]:
+    """텍스트 요약, 키워드, 주제 추출"""
+    try:
+        response = await client.chat.completions.create(**summary_request(text))
+        return parse_summary(response.choices[0].message.content)
+            
+    except Exception as e:
+        print(f"Summarization error: {e}")
+        return "요약 생성 실패", [], []
+
+async def condense_notes(notes_content: List[str]) -> str:
+    """노트 묶음을 공통 주제 중심으로 압축 요약 (인사이트 map 단계, 실패 시 빈 문자열)"""
+    try:
+        combined_text = "\n\n---\n\n".join(notes_content)
+        
+        prompt = f"""
+다음 노트들의 핵심 주장, 반복되는 주제, 노트 간 연결점을 간결한 글머리표로 정리하세요.
+노트 제목을 괄호로 함께 적어 출처를 남기세요.
+
+노트들:
+{combined_text}
 """
         
         response = await client.chat.completions.create(
             model=settings.GPT_MODEL,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant that analyzes text and returns JSON."},
+                {"role": "system", "content": "You condense notes into dense, faithful summaries."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
+            temperature=0.2,
+            max_tokens=settings.INSIGHT_MAP_SUMMARY_TOKENS
         )
+        return response.choices[0].message.content or ""
         
-        content = response.choices[0].message.content
-        
-        # JSON 파싱
-        try:
-            data = json.loads(content)
-            summary = data.get("summary", "")
-            keywords = data.get("keywords", [])
-            topics = data.get("main_topics", [])
-            return summary, keywords, topics
-        except json.JSONDecodeError:
-            # 파싱 실패 시 정규식으로 추출 시도
-            summary = re.search(r'"summary":\s*"([^"]+)"', content)
-            summary = summary.group(1) if summary else "요약을 생성할 수 없습니다."
-            return summary, [], []
-            
     except Exception as e:
-        print(f"Summarization error: {e}")
-        return "요약 생성 실패", [], []
+        print(f"Condense error: {e}")
+        return ""
 
 async def generate_insight(notes_content: List[str]) -> Tuple[str, List[str]]:
-    """여러 노트를 기반으로 인사이트 생성"""
+    """여러 노트를 기반으로 인사이트 생성
+
+    notes_content는 prompt_packing으로 토큰 예산에 맞춰 준비된 노트 조각이다.
+    """
     try:
-        combined_text = "\n\n---\n\n".join(notes_content[:5])  # 최대 5개 노트만
+        combined_text = "\n\n---\n\n".join(notes_content)
         
         prompt = f"""
 다음은 사용자의 여러 노트입니다. 이들을 종합하여:
@@ -75,7 +134,7 @@ async def generate_insight(notes_content: List[str]) -> Tuple[str, List[str]]:
 2. 추가로 탐구하면 좋을 관련 주제 3개를 제안하세요.
 
 노트들:
-{combined_text[:4000]}
+{combined_text}
 
 JSON 형식으로 응답:
 {{"insight": "통찰 문장", "related_topics": ["주제1", "주제2", "주제3"]}}
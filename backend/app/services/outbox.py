@@ -0,0 +1,249 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services.enrichment import index_note
+from app.services.query_cache import similarity_cache
+from app.services.vector_store import vector_store
+
+UPSERT = "upsert"
+RETAG = "retag"  # upsert + 유지된 청크의 태그도 갱신 (노트 태그가 바뀌었을 때)
+DELETE = "delete"
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def enqueue(db: Session, note_id: int, user_id: int, operation: str) -> None:
+    """벡터 작업 기록 (커밋하지 않음 - 노트 변경과 같은 트랜잭션으로 커밋)"""
+    db.add(models.VectorOutbox(
+        note_id=note_id,
+        user_id=user_id,
+        operation=operation,
+        attempts=0,
+        available_at=_now()
+    ))
+
+def queue_unindexed_notes(db: Session) -> int:
+    """청크 기록이 없는 노트(청크 도입 이전 데이터)를 upsert 작업으로 등록
+
+    이미 대기 중인 upsert가 있는 노트는 건너뛴다. 반환: 등록한 노트 수
+    """
+    indexed = db.query(models.NoteChunk.note_id)
+    pending = db.query(models.VectorOutbox.note_id)\
+        .filter(models.VectorOutbox.processed_at.is_(None))\
+        .filter(models.VectorOutbox.operation.in_([UPSERT, RETAG]))
+    notes = db.query(models.Note.id, models.Note.user_id)\
+        .filter(models.Note.id.notin_(indexed))\
+        .filter(models.Note.id.notin_(pending))\
+        .all()
+    for note_id, user_id in notes:
+        enqueue(db, note_id, user_id, UPSERT)
+    db.commit()
+    return len(notes)
+
+def queue_indexed_notes(db: Session) -> int:
+    """청크가 저장된 모든 노트를 retag 작업으로 등록
+
+    바뀐 청크가 없으면 임베딩 없이 청크에 저장된 태그만 갱신된다 (태그 속성 도입 후 이관용).
+    반환: 등록한 노트 수
+    """
+    indexed = db.query(models.NoteChunk.note_id)
+    notes = db.query(models.Note.id, models.Note.user_id)\
+        .filter(models.Note.id.in_(indexed))\
+        .all()
+    for note_id, user_id in notes:
+        enqueue(db, note_id, user_id, RETAG)
+    db.commit()
+    return len(notes)
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(settings.OUTBOX_MAX_BACKOFF, 2 ** attempts))
+
+async def drain_outbox(
+    db: Session,
+    batch_size: Optional[int] = None,
+    note_id: Optional[int] = None
+) -> int:
+    """대기 중인 벡터 작업을 한 배치 처리
+
+    같은 노트의 작업은 마지막 것만 적용하고 (중간에 retag가 있었으면 태그도 갱신),
+    삭제는 한 번에 묶어서 처리한다.
+    모든 작업은 멱등이므로 (결정적 UUID, 청크 해시 비교) 실패 시 그대로 재시도한다.
+    처리 중에 커밋이 일어나 행 잠금이 풀리므로, 먼저 available_at을 OUTBOX_LEASE만큼
+    미뤄서 커밋해 작업을 점유한다 (다른 작업자는 건너뛰고, 중간에 죽으면 임대 만료 후 재시도).
+    반환: 처리 완료된 작업 수
+    """
+    query = db.query(models.VectorOutbox)\
+        .filter(models.VectorOutbox.processed_at.is_(None))\
+        .filter(models.VectorOutbox.available_at <= _now())
+    if note_id is not None:
+        query = query.filter(models.VectorOutbox.note_id == note_id)
+    entries = query\
+        .order_by(models.VectorOutbox.id)\
+        .limit(batch_size or settings.OUTBOX_BATCH_SIZE)\
+        .with_for_update(skip_locked=True)\
+        .all()
+    if not entries:
+        return 0
+    lease_until = _now() + timedelta(seconds=settings.OUTBOX_LEASE)
+    for entry in entries:
+        entry.available_at = lease_until
+    db.commit()
+
+    # 노트별 마지막 작업만 적용
+    latest: Dict[int, models.VectorOutbox] = {}
+    retag = set()
+    for entry in entries:
+        latest[entry.note_id] = entry
+        if entry.operation == RETAG:
+            retag.add(entry.note_id)
+    targets = [(entry.note_id, entry.user_id, entry.operation) for entry in latest.values()]
+
+    done = set()
+    errors: Dict[int, str] = {}
+
+    deletes = [nid for nid, _, op in targets if op == DELETE]
+    if deletes:
+        if await vector_store.delete_notes_vectors(deletes):
+            done.update(deletes)
+        else:
+            errors.update({nid: "vector delete failed" for nid in deletes})
+
+    for nid, _, op in targets:
+        if op == DELETE:
+            continue
+        try:
+            note = db.get(models.Note, nid)
+            if note is None:
+                # 이후 삭제된 노트 - 남은 벡터 정리
+                if not await vector_store.delete_note_vector(nid):
+                    raise RuntimeError("vector delete failed")
+            else:
+                await index_note(db, note, retag=nid in retag)
+            done.add(nid)
+        except Exception as e:
+            db.rollback()
+            errors[nid] = str(e)
+
+    processed = 0
+    now = _now()
+    for entry in entries:
+        if entry.note_id in done:
+            entry.processed_at = now
+            processed += 1
+        else:
+            entry.attempts = (entry.attempts or 0) + 1
+            entry.last_error = errors.get(entry.note_id, "")[:1000]
+            entry.available_at = now + _backoff(entry.attempts)
+            print(f"Outbox {entry.operation} failed for note {entry.note_id} (attempt {entry.attempts}): {entry.last_error}")
+    db.commit()
+
+    for user_id in {user_id for nid, user_id, _ in targets if nid in done}:
+        similarity_cache.bump(user_id)
+    return processed
+
+def purge_processed(db: Session, older_than: timedelta = timedelta(days=1)) -> int:
+    """처리 완료된 오래된 작업 삭제"""
+    count = db.query(models.VectorOutbox)\
+        .filter(models.VectorOutbox.processed_at < _now() - older_than)\
+        .delete(synchronize_session=False)
+    db.commit()
+    return count
+
+async def reconcile(db: Session, dry_run: bool = False) -> Dict[str, int]:
+    """DB 청크 목록과 벡터 저장소를 비교해 차이 복구
+
+    - DB에 없는 노트의 벡터 삭제
+    - DB에 없는 청크 벡터 삭제
+    - 벡터가 없는 청크/노트는 청크 기록을 지우고 upsert 작업 등록
+    """
+    stored = await vector_store.list_chunk_keys()
+    if stored is None:
+        raise RuntimeError("vector store unavailable")
+    stored_keys = set(stored)
+
+    note_users = {nid: uid for nid, uid in db.query(models.Note.id, models.Note.user_id).all()}
+    db_keys = {
+        (nid, chunk_hash)
+        for nid, chunk_hash in db.query(models.NoteChunk.note_id, models.NoteChunk.content_hash).all()
+    }
+    indexed_notes = {nid for nid, _ in db_keys}
+
+    orphan_notes = sorted({nid for nid, _ in stored_keys if nid not in note_users})
+    extra_chunks = defaultdict(list)
+    for nid, chunk_hash in stored_keys - db_keys:
+        if nid in note_users:
+            extra_chunks[nid].append(chunk_hash)
+    missing = db_keys - stored_keys
+    repair_notes = {nid for nid, _ in missing} | (set(note_users) - indexed_notes)
+
+    report = {
+        "stored_chunks": len(stored_keys),
+        "db_chunks": len(db_keys),
+        "orphan_notes": len(orphan_notes),
+        "extra_chunks": sum(len(hashes) for hashes in extra_chunks.values()),
+        "missing_chunks": len(missing),
+        "notes_to_reindex": len(repair_notes),
+    }
+    if dry_run:
+        return report
+
+    for start in range(0, len(orphan_notes), 500):
+        await vector_store.delete_notes_vectors(orphan_notes[start:start + 500])
+    for nid, hashes in extra_chunks.items():
+        await vector_store.delete_chunks(nid, hashes)
+
+    # 벡터가 빠진 청크는 기록을 지워야 다음 동기화에서 다시 임베딩됨
+    for nid, chunk_hash in missing:
+        db.query(models.NoteChunk)\
+            .filter(models.NoteChunk.note_id == nid)\
+            .filter(models.NoteChunk.content_hash == chunk_hash)\
+            .delete(synchronize_session=False)
+    for nid in repair_notes:
+        enqueue(db, nid, note_users[nid], UPSERT)
+    db.commit()
+    return report
+
+class OutboxWorker:
+    """백그라운드에서 outbox를 주기적으로 비우는 작업자"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        rounds = 0
+        while True:
+            processed = 0
+            try:
+                with SessionLocal() as db:
+                    processed = await drain_outbox(db)
+                    rounds += 1
+                    if rounds % 100 == 0:
+                        purge_processed(db)
+            except Exception as e:
+                print(f"Outbox worker error: {e}")
+
+            # 밀린 작업이 있으면 바로 다음 배치
+            if processed >= settings.OUTBOX_BATCH_SIZE:
+                continue
+            await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL)
+
+# 싱글톤 인스턴스
+outbox_worker = OutboxWorker()
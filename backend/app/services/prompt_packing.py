@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple, Union
+import numpy as np
+from app.core.config import settings
+from app.db import models
+from app.services.chunking import build_chunks
+from app.services.openai_client import condense_notes
+from app.services.vector_store import vector_store
+
+try:
+    import tiktoken
+except ImportError:  # requirements에 포함, 설치되지 않은 환경에서는 문자 수로 추정
+    tiktoken = None
+
+NOTE_OVERHEAD_TOKENS = 8  # 노트 사이 구분자 등
+MIN_FRAGMENT_TOKENS = 48  # 이보다 짧게 잘라야 하면 조각을 넣지 않음
+
+class TokenCounter:
+    """토큰 수 계산 + 조각별 토큰화 결과 LRU 캐시
+
+    tiktoken이 있으면 토큰 ID를 캐시해서 자를 때 다시 토큰화하지 않고,
+    없으면 ASCII 4자 = 1토큰, 그 외 문자(한글 등) 1자 = 1토큰으로 보수적으로 추정한다.
+    인코딩은 처음 쓸 때 준비한다 (tiktoken은 처음에 BPE 파일을 내려받으므로 import 시점에 하지 않음).
+    """
+
+    def __init__(self, model: str, max_entries: int):
+        self.model = model
+        self.max_entries = max_entries
+        self._encoding = None
+        self._encoding_loaded = False
+        self._entries: "OrderedDict[str, Union[List[int], int]]" = OrderedDict()
+
+    def _load_encoding(self) -> None:
+        """tiktoken 인코딩 준비 (다운로드/캐시 실패 등 어떤 오류든 추정치로 대체)"""
+        self._encoding_loaded = True
+        if tiktoken is None:
+            return
+        try:
+            try:
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"Tokenizer load error (using estimates): {e}")
+
+    @staticmethod
+    def estimate(text: str) -> int:
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return -(-ascii_chars // 4) + (len(text) - ascii_chars)
+
+    def _tokens(self, text: str) -> Union[List[int], int]:
+        if not self._encoding_loaded:
+            self._load_encoding()
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        tokens = self._entries.get(key)
+        if tokens is None:
+            tokens = self._encoding.encode(text) if self._encoding else self.estimate(text)
+            self._entries[key] = tokens
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+        return tokens
+
+    def count(self, text: str) -> int:
+        tokens = self._tokens(text)
+        return tokens if isinstance(tokens, int) else len(tokens)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """max_tokens 이하로 자르기"""
+        if max_tokens <= 0:
+            return ""
+        tokens = self._tokens(text)
+        if isinstance(tokens, list):
+            return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens]) + "…"
+        if tokens <= max_tokens:
+            return text
+        # 추정치 기준: 비율로 자른 뒤 넘치면 조금씩 줄임
+        cut = len(text) * max_tokens // tokens
+        while cut > 0 and self.estimate(text[:cut]) > max_tokens:
+            cut = cut * 9 // 10
+        return text[:cut] + "…"
+
+token_counter = TokenCounter(settings.GPT_MODEL, settings.TOKEN_CACHE_SIZE)
+
+@dataclass
+class NoteDigest:
+    """프롬프트에 넣을 노트 조각 (헤더 = 제목 + 요약, 청크 = (순서, 관련도, 내용))"""
+    header: str
+    chunks: List[Tuple[int, float, str]] = field(default_factory=list)
+
+def pack_digests(digests: Sequence[NoteDigest], budget: int) -> List[str]:
+    """토큰 예산을 노트들에 배분해서 노트별 텍스트 생성
+
+    1. 모든 노트의 헤더(제목 + 저장된 요약)를 노트당 균등 상한 안에서 먼저 넣는다.
+    2. 남은 예산은 청크에 쓴다. 각 노트의 관련도 1위 청크를 모두 넣은 뒤 2위, 3위... 순서로
+       채워서 한 노트가 예산을 독차지하지 않게 한다.
+    노트 순서는 입력 순서를 유지하고, 노트 안의 청크는 원래 순서로 붙인다.
+    """
+    if not digests:
+        return []
+    per_note = max(MIN_FRAGMENT_TOKENS, budget // len(digests) - NOTE_OVERHEAD_TOKENS)
+    headers = [token_counter.truncate(digest.header, per_note) for digest in digests]
+    remaining = budget - sum(token_counter.count(h) + NOTE_OVERHEAD_TOKENS for h in headers)
+
+    candidates = []
+    for note_index, digest in enumerate(digests):
+        ranked = sorted(digest.chunks, key=lambda chunk: -chunk[1])
+        for rank, (chunk_index, score, text) in enumerate(ranked):
+            candidates.append((rank, -score, note_index, chunk_index, text))
+    candidates.sort(key=lambda c: c[:2])
+
+    selected: List[List[Tuple[int, str]]] = [[] for _ in digests]
+    for _, _, note_index, chunk_index, text in candidates:
+        if remaining < MIN_FRAGMENT_TOKENS:
+            break
+        cost = token_counter.count(text)
+        if cost > remaining:
+            text = token_counter.truncate(text, remaining)
+            cost = token_counter.count(text)
+        selected[note_index].append((chunk_index, text))
+        remaining -= cost
+
+    packed = []
+    for header, chunks in zip(headers, selected):
+        parts = [header] + [text for _, text in sorted(chunks)]
+        packed.append("\n".join(parts))
+    return packed
+
+async def load_digests(notes: Sequence[models.Note]) -> List[NoteDigest]:
+    """노트별 헤더와 청크 관련도 계산
+
+    관련도는 선택된 노트 전체의 중심 벡터와 청크 벡터의 코사인 유사도로,
+    노트들이 공유하는 주제에 가까운 구간을 우선한다. 벡터가 없으면 앞쪽 청크 우선.
+    """
+    chunk_vectors = await vector_store.get_chunk_vectors([note.id for note in notes])
+
+    # 노트마다 같은 가중치로 중심 벡터 계산
+    note_means = []
+    for vectors in chunk_vectors.values():
+        matrix = np.asarray(list(vectors.values()), dtype=np.float32)
+        mean = matrix.mean(axis=0)
+        note_means.append(mean / (np.linalg.norm(mean) or 1.0))
+    centroid: Optional[np.ndarray] = None
+    if note_means:
+        centroid = np.mean(note_means, axis=0)
+        centroid /= np.linalg.norm(centroid) or 1.0
+
+    digests = []
+    for note in notes:
+        header = f"# {note.title}"
+        if note.summary:
+            header += f"\n요약: {note.summary}"
+        vectors = chunk_vectors.get(note.id, {})
+        chunks = []
+        for chunk in build_chunks(note.title, note.content):
+            vector = vectors.get(chunk.hash)
+            if centroid is not None and vector is not None:
+                vector = np.asarray(vector, dtype=np.float32)
+                score = float(vector @ centroid / (np.linalg.norm(vector) or 1.0))
+            else:
+                score = 1.0 / (1 + chunk.index) - 1.0
+            chunks.append((chunk.index, score, chunk.text))
+        digests.append(NoteDigest(header=header, chunks=chunks))
+    return digests
+
+async def _map_reduce(digests: List[NoteDigest], budget: int) -> List[str]:
+    """노트가 예산에 다 들어가지 않으면 그룹별 요약을 동시에 만들고 그 요약으로 다시 시도"""
+    if len(digests) * (settings.INSIGHT_MIN_NOTE_TOKENS + NOTE_OVERHEAD_TOKENS) <= budget:
+        return pack_digests(digests, budget)
+
+    # map: 그룹당 노트가 최소 상한의 4배를 쓸 수 있는 크기로 묶어 동시에 압축
+    group_size = max(2, budget // ((settings.INSIGHT_MIN_NOTE_TOKENS + NOTE_OVERHEAD_TOKENS) * 4))
+    groups = [digests[i:i + group_size] for i in range(0, len(digests), group_size)]
+    semaphore = asyncio.Semaphore(settings.INSIGHT_MAP_CONCURRENCY)
+
+    async def condense(group: List[NoteDigest]) -> str:
+        async with semaphore:
+            return await condense_notes(pack_digests(group, budget))
+
+    summaries = await asyncio.gather(*(condense(group) for group in groups))
+
+    # reduce: 그룹 요약을 노트처럼 취급 (실패한 그룹은 노트 헤더로 대체)
+    reduced = []
+    for number, (group, summary) in enumerate(zip(groups, summaries), start=1):
+        if not summary:
+            summary = "\n".join(digest.header for digest in group)
+        reduced.append(NoteDigest(header=f"# 노트 묶음 {number} ({len(group)}개)\n{summary}"))
+    return await _map_reduce(reduced, budget)
+
+async def pack_notes_for_insight(notes: Sequence[models.Note]) -> List[str]:
+    """인사이트 프롬프트용 노트 텍스트 목록 (합계가 INSIGHT_PROMPT_TOKENS 이하)"""
+    digests = await load_digests(notes)
+    return await _map_reduce(digests, settings.INSIGHT_PROMPT_TOKENS)
@@ -0,0 +1,170 @@
+import numpy as np
+from typing import Dict
+
+# 한 번에 처리할 행 수 (임시 float32 배열 크기 제한)
+BLOCK_ROWS = 16384
+
+def normalize(data: np.ndarray) -> np.ndarray:
+    """L2 정규화 (코사인 유사도 = 내적)"""
+    data = np.asarray(data, dtype=np.float32)
+    norms = np.linalg.norm(data, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return data / norms
+
+def truncate(data: np.ndarray, dimensions: int) -> np.ndarray:
+    """Matryoshka 임베딩 차원 축소 (앞쪽 차원만 사용 후 재정규화)"""
+    data = np.asarray(data, dtype=np.float32)
+    if dimensions and dimensions < data.shape[-1]:
+        data = data[..., :dimensions]
+    return normalize(data)
+
+def nearest_centroids(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """각 벡터에서 가장 가까운 중심점 인덱스 (L2)"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assign = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), BLOCK_ROWS):
+        block = data[start:start + BLOCK_ROWS]
+        distances = centroid_norms - 2 * block @ centroids.T
+        assign[start:start + BLOCK_ROWS] = distances.argmin(axis=1)
+    return assign
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """간단한 k-means (Lloyd)"""
+    data = np.asarray(data, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = nearest_centroids(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        # 빈 클러스터는 이전 중심점 유지
+        centroids[filled] = sums[filled] / counts[filled, None]
+
+    return centroids
+
+class FlatQuantizer:
+    """양자화 없음 (float32 그대로 저장)"""
+    kind = "none"
+    min_train = 0
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.trained = True
+
+    def train(self, data: np.ndarray) -> None:
+        pass
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        return np.asarray(data, dtype=np.float32)
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        return codes @ query
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        pass
+
+class Int8Quantizer:
+    """차원별 스칼라 양자화 (float32 -> uint8, 4배 압축)"""
+    kind = "int8"
+    min_train = 256
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.trained = False
+        self.low = None
+        self.scale = None
+
+    def train(self, data: np.ndarray) -> None:
+        low = data.min(axis=0)
+        high = data.max(axis=0)
+        self.low = low.astype(np.float32)
+        self.scale = np.maximum((high - low) / 255.0, 1e-8).astype(np.float32)
+        self.trained = True
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        codes = np.rint((data - self.low) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # q·x ≈ q·low + (q*scale)·code
+        weights = query * self.scale
+        bias = float(query @ self.low)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS].astype(np.float32)
+            out[start:start + BLOCK_ROWS] = block @ weights + bias
+        return out
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"low": self.low, "scale": self.scale}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.low = state["low"]
+        self.scale = state["scale"]
+        self.trained = True
+
+class PQQuantizer:
+    """Product quantization (부분 공간별 256개 중심점, 벡터당 subvectors 바이트)"""
+    kind = "pq"
+    min_train = 1024
+
+    def __init__(self, dimensions: int, subvectors: int):
+        # 차원을 나누어 떨어지는 가장 가까운 부분 공간 수 사용
+        while dimensions % subvectors:
+            subvectors -= 1
+        self.dimensions = dimensions
+        self.subvectors = subvectors
+        self.sub_dim = dimensions // subvectors
+        self.trained = False
+        self.codebooks = None  # (subvectors, 256, sub_dim)
+
+    def _split(self, data: np.ndarray) -> np.ndarray:
+        return data.reshape(len(data), self.subvectors, self.sub_dim)
+
+    def train(self, data: np.ndarray) -> None:
+        parts = self._split(data)
+        codebooks = np.zeros((self.subvectors, 256, self.sub_dim), dtype=np.float32)
+        for j in range(self.subvectors):
+            centroids = kmeans(parts[:, j, :], 256, seed=j)
+            codebooks[j, :len(centroids)] = centroids
+        self.codebooks = codebooks
+        self.trained = True
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        parts = self._split(np.asarray(data, dtype=np.float32))
+        codes = np.empty((len(data), self.subvectors), dtype=np.uint8)
+        for j in range(self.subvectors):
+            codes[:, j] = nearest_centroids(parts[:, j, :], self.codebooks[j])
+        return codes
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # ADC: 부분 공간별 내적 테이블을 만들고 코드로 조회해서 합산
+        table = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.subvectors, self.sub_dim))
+        out = np.empty(len(codes), dtype=np.float32)
+        columns = np.arange(self.subvectors)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            out[start:start + BLOCK_ROWS] = table[columns, block].sum(axis=1)
+        return out
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.codebooks = state["codebooks"]
+        self.trained = True
+
+def make_quantizer(kind: str, dimensions: int, subvectors: int = 64):
+    """설정값으로 양자화기 생성"""
+    if kind == "int8":
+        return Int8Quantizer(dimensions)
+    if kind == "pq":
+        return PQQuantizer(dimensions, subvectors)
+    return FlatQuantizer(dimensions)
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from app.core.config import settings
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 쿼리 정규화 (공백 정리 + 대소문자 무시)"""
+    return " ".join(query.split()).casefold()
+
+class SimilarityCache:
+    """사용자별 유사도 검색 결과 캐시 (TTL + LRU)
+
+    키에 사용자별 세대(generation) 번호가 포함되어 있어서, 노트 생성/수정/삭제 때
+    bump()로 세대를 올리면 이전 결과는 더 이상 조회되지 않고 LRU로 밀려난다.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, 0)
+
+    def bump(self, user_id: int) -> None:
+        """사용자의 벡터가 바뀌었을 때 호출"""
+        self._generations[user_id] = self.generation(user_id) + 1
+
+    def _key(self, user_id: int, query: str, limit: int, *extra: Hashable) -> Tuple[Hashable, ...]:
+        return (user_id, self.generation(user_id), normalize_query(query), limit) + extra
+
+    def get(self, user_id: int, query: str, limit: int, *extra: Hashable) -> Optional[Any]:
+        key = self._key(user_id, query, limit, *extra)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(
+        self,
+        user_id: int,
+        query: str,
+        limit: int,
+        value: Any,
+        *extra: Hashable,
+        generation: Optional[int] = None
+    ) -> None:
+        """결과 저장 (generation: 검색 시작 시점의 세대, 그 사이 바뀌었으면 저장 안 함)"""
+        if generation is not None and generation != self.generation(user_id):
+            return
+        key = self._key(user_id, query, limit, *extra)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+# 싱글톤 인스턴스
+similarity_cache = SimilarityCache(
+    max_entries=settings.SIMILAR_CACHE_SIZE,
+    ttl_seconds=settings.SIMILAR_CACHE_TTL
+)
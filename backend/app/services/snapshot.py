@@ -0,0 +1,362 @@
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+import orjson
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services.chunking import build_chunks
+from app.services.outbox import enqueue, UPSERT
+from app.services.tags import normalize_tags, set_note_tags
+from app.services.vector_store import vector_store
+
+SNAPSHOT_VERSION = 1
+NDJSON = "ndjson"
+COLUMNAR = "columnar"
+MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    COLUMNAR: "application/vnd.brainsxlm.snapshot+ndjson",
+}
+
+NOTE_COLUMNS = [
+    "id", "user_id", "title", "content", "summary", "tags",
+    "title_hash", "content_hash", "created_at", "updated_at",
+]
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+
+def _encode_vectors(vectors: List[np.ndarray]) -> Dict[str, Any]:
+    """벡터 묶음을 float32 바이트(base64)로 (열 단위 형식용)"""
+    if not vectors:
+        return {"dims": 0, "data": ""}
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return {"dims": matrix.shape[1], "data": base64.b64encode(matrix.tobytes()).decode("ascii")}
+
+def _decode_vectors(block: Dict[str, Any]) -> np.ndarray:
+    if not block["dims"]:
+        return np.zeros((0, 0), dtype=np.float32)
+    data = np.frombuffer(base64.b64decode(block["data"]), dtype=np.float32)
+    return data.reshape(-1, block["dims"])
+
+# --- 내보내기 ---
+
+def _note_chunks(db: Session, note_ids: List[int]) -> Dict[int, List[Any]]:
+    chunks: Dict[int, List[Any]] = {}
+    for row in db.query(models.NoteChunk.note_id, models.NoteChunk.chunk_index, models.NoteChunk.content_hash)\
+            .filter(models.NoteChunk.note_id.in_(note_ids))\
+            .order_by(models.NoteChunk.note_id, models.NoteChunk.chunk_index):
+        chunks.setdefault(row.note_id, []).append(row)
+    return chunks
+
+async def iter_snapshot(
+    user_id: Optional[int] = None,
+    fmt: str = NDJSON,
+    include_vectors: bool = True,
+    batch_size: int = 500
+) -> AsyncIterator[bytes]:
+    """노트, 청크 벡터, 연결을 한 줄씩 스트리밍
+
+    서버 측 커서(yield_per)로 batch_size개씩 읽어서 메모리 사용량이 노트 수와 무관하다.
+    DB 호출은 이 내보내기 전용 스레드 하나에서 실행해서 이벤트 루프를 막지 않는다
+    (세션과 커서를 만든 스레드에서만 쓰므로 SQLite에서도 안전).
+    ndjson: 레코드 한 줄씩 {"type": "note" | "connection" | "user", ...}
+    columnar: 배치마다 {"table": ..., "columns": {...}} 한 줄 (벡터는 float32 base64)
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+    loop = asyncio.get_running_loop()
+
+    def run(fn, *args):
+        return loop.run_in_executor(executor, fn, *args)
+
+    db = await run(SessionLocal)
+    try:
+        yield _line({
+            "type": "meta",
+            "version": SNAPSHOT_VERSION,
+            "format": fmt,
+            "created_at": datetime.now(timezone.utc),
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "chunk_size": settings.CHUNK_SIZE,
+            "chunk_overlap": settings.CHUNK_OVERLAP,
+            "user_id": user_id,
+        })
+
+        users = db.query(models.User)
+        if user_id is not None:
+            users = users.filter(models.User.id == user_id)
+        for user in await run(users.all):
+            yield _line({
+                "type": "user",
+                "id": user.id,
+                "email": user.email,
+                "name": user.name,
+                "preferences": user.preferences or {},
+            })
+
+        notes = select(*[getattr(models.Note, column) for column in NOTE_COLUMNS]).order_by(models.Note.id)
+        if user_id is not None:
+            notes = notes.where(models.Note.user_id == user_id)
+        result = await run(db.execute, notes.execution_options(yield_per=batch_size))
+        pages = result.partitions()
+        while True:
+            rows = await run(next, pages, None)
+            if rows is None:
+                break
+            note_ids = [row.id for row in rows]
+            chunks = await run(_note_chunks, db, note_ids)
+            vectors = await vector_store.get_chunk_vectors(note_ids) if include_vectors else {}
+
+            if fmt == COLUMNAR:
+                yield _line({
+                    "table": "notes",
+                    "columns": {column: [getattr(row, column) for row in rows] for column in NOTE_COLUMNS},
+                })
+                chunk_rows = [chunk for note_id in note_ids for chunk in chunks.get(note_id, [])]
+                if include_vectors:
+                    # 벡터가 있는 청크만 (없는 청크는 복원 시 다시 임베딩)
+                    chunk_rows = [c for c in chunk_rows if c.content_hash in vectors.get(c.note_id, {})]
+                block = {
+                    "table": "chunks",
+                    "columns": {
+                        "note_id": [c.note_id for c in chunk_rows],
+                        "chunk_index": [c.chunk_index for c in chunk_rows],
+                        "hash": [c.content_hash for c in chunk_rows],
+                    },
+                }
+                if include_vectors:
+                    block["vectors"] = _encode_vectors([vectors[c.note_id][c.content_hash] for c in chunk_rows])
+                yield _line(block)
+                continue
+
+            for row in rows:
+                record = {"type": "note", **{column: getattr(row, column) for column in NOTE_COLUMNS}}
+                note_vectors = vectors.get(row.id, {})
+                record["chunks"] = [
+                    {
+                        "index": chunk.chunk_index,
+                        "hash": chunk.content_hash,
+                        **({"vector": note_vectors.get(chunk.content_hash)} if include_vectors else {}),
+                    }
+                    for chunk in chunks.get(row.id, [])
+                ]
+                yield _line(record)
+
+        connections = select(
+            models.NoteConnection.source_note_id,
+            models.NoteConnection.target_note_id,
+            models.NoteConnection.similarity_score
+        ).order_by(models.NoteConnection.id)
+        if user_id is not None:
+            connections = connections\
+                .join(models.Note, models.Note.id == models.NoteConnection.source_note_id)\
+                .where(models.Note.user_id == user_id)
+        result = await run(db.execute, connections.execution_options(yield_per=batch_size))
+        pages = result.partitions()
+        while True:
+            rows = await run(next, pages, None)
+            if rows is None:
+                break
+            if fmt == COLUMNAR:
+                yield _line({
+                    "table": "connections",
+                    "columns": {
+                        "source": [row.source_note_id for row in rows],
+                        "target": [row.target_note_id for row in rows],
+                        "score": [row.similarity_score for row in rows],
+                    },
+                })
+            else:
+                for row in rows:
+                    yield _line({
+                        "type": "connection",
+                        "source": row.source_note_id,
+                        "target": row.target_note_id,
+                        "score": row.similarity_score,
+                    })
+    finally:
+        await run(db.close)
+        executor.shutdown(wait=False)
+
+# --- 복원 ---
+
+def iter_records(lines: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """두 형식 모두 ndjson 레코드 단위로 변환 (열 단위 노트 배치에는 바로 뒤 청크 배치를 붙임)"""
+    notes: List[Dict[str, Any]] = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        table = record.get("table")
+        if table == "chunks":
+            by_note = {note["id"]: note["chunks"] for note in notes}
+            columns = record["columns"]
+            vectors = _decode_vectors(record["vectors"]) if "vectors" in record else None
+            for i, (note_id, index, chunk_hash) in enumerate(zip(columns["note_id"], columns["chunk_index"], columns["hash"])):
+                if note_id in by_note:
+                    by_note[note_id].append({
+                        "index": index,
+                        "hash": chunk_hash,
+                        "vector": vectors[i] if vectors is not None else None,
+                    })
+            continue
+
+        yield from notes
+        notes = []
+        if table is None:
+            yield record
+        elif table == "notes":
+            columns = record["columns"]
+            for values in zip(*(columns[column] for column in NOTE_COLUMNS)):
+                notes.append({"type": "note", "chunks": [], **dict(zip(NOTE_COLUMNS, values))})
+        elif table == "connections":
+            columns = record["columns"]
+            for source, target, score in zip(columns["source"], columns["target"], columns["score"]):
+                yield {"type": "connection", "source": source, "target": target, "score": score}
+    yield from notes
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+class _Restorer:
+    """노트/연결을 배치 단위로 DB와 벡터 저장소에 복원"""
+
+    def __init__(self, db: Session, batch_size: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.notes: List[Dict[str, Any]] = []
+        self.connections: List[Dict[str, Any]] = []
+        self.report = {"notes": 0, "skipped_notes": 0, "chunks": 0, "reembed_notes": 0, "connections": 0}
+
+    async def add_note(self, record: Dict[str, Any]) -> None:
+        self.notes.append(record)
+        if len(self.notes) >= self.batch_size:
+            await self.flush_notes()
+
+    async def add_connection(self, record: Dict[str, Any]) -> None:
+        # 연결은 양쪽 노트가 들어간 뒤에 반영
+        await self.flush_notes()
+        self.connections.append(record)
+        if len(self.connections) >= self.batch_size:
+            self.flush_connections()
+
+    async def flush_notes(self) -> None:
+        if not self.notes:
+            return
+        existing = {
+            note_id for (note_id,) in self.db.query(models.Note.id)
+                .filter(models.Note.id.in_([record["id"] for record in self.notes]))
+        }
+        for record in self.notes:
+            if record["id"] in existing:
+                self.report["skipped_notes"] += 1
+            else:
+                await self._restore_note(record)
+        self.db.commit()
+        self.db.expunge_all()
+        self.notes = []
+
+    async def _restore_note(self, record: Dict[str, Any]) -> None:
+        note = models.Note(
+            id=record["id"],
+            user_id=record["user_id"],
+            title=record["title"],
+            content=record["content"],
+            summary=record["summary"],
+            title_hash=record["title_hash"],
+            content_hash=record["content_hash"],
+            created_at=_parse_time(record["created_at"]),
+            updated_at=_parse_time(record["updated_at"]),
+        )
+        self.db.add(note)
+        set_note_tags(note, list(record["tags"] or []))
+
+        # 현재 청킹 설정으로 만든 청크와 해시가 같고 벡터가 있는 것만 그대로 사용
+        saved = {
+            chunk["hash"]: chunk["vector"]
+            for chunk in record["chunks"]
+            if chunk.get("vector") is not None
+        }
+        chunks = build_chunks(note.title, note.content)
+        reusable = [(chunk, [float(x) for x in saved[chunk.hash]]) for chunk in chunks if chunk.hash in saved]
+        if reusable and not await vector_store.upsert_chunks(
+            note.id, note.user_id, reusable, tags=normalize_tags(note.tags)
+        ):
+            reusable = []
+        for chunk, _ in reusable:
+            note.chunks.append(models.NoteChunk(chunk_index=chunk.index, content_hash=chunk.hash))
+        self.report["notes"] += 1
+        self.report["chunks"] += len(reusable)
+
+        # 빠진 청크는 outbox가 다시 임베딩
+        if len(reusable) != len(chunks):
+            enqueue(self.db, note.id, note.user_id, UPSERT)
+            self.report["reembed_notes"] += 1
+
+    def flush_connections(self) -> None:
+        if not self.connections:
+            return
+        ids = {c["source"] for c in self.connections} | {c["target"] for c in self.connections}
+        note_ids = {nid for (nid,) in self.db.query(models.Note.id).filter(models.Note.id.in_(ids))}
+        existing = set(
+            self.db.query(models.NoteConnection.source_note_id, models.NoteConnection.target_note_id)
+                .filter(models.NoteConnection.source_note_id.in_([c["source"] for c in self.connections]))
+                .all()
+        )
+        for c in self.connections:
+            if c["source"] in note_ids and c["target"] in note_ids and (c["source"], c["target"]) not in existing:
+                self.db.add(models.NoteConnection(
+                    source_note_id=c["source"],
+                    target_note_id=c["target"],
+                    similarity_score=c["score"]
+                ))
+                self.report["connections"] += 1
+        self.db.commit()
+        self.connections = []
+
+def _sync_sequences(db: Session) -> None:
+    """id를 직접 넣었으므로 PostgreSQL 시퀀스를 최댓값으로 맞춤"""
+    if db.bind.dialect.name != "postgresql":
+        return
+    for table in ("users", "notes", "note_connections"):
+        db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+    db.commit()
+
+async def restore_snapshot(db: Session, lines: Iterable[bytes], batch_size: int = 500) -> Dict[str, int]:
+    """스냅샷에서 노트/연결/벡터 복원 (임베딩 API 호출 없음)
+
+    이미 있는 노트 id는 건너뛴다. 스냅샷의 청크 해시가 현재 청킹 설정/임베딩 모델과
+    다르거나 벡터가 없는 노트는 outbox에 등록해서 다시 임베딩한다.
+    """
+    restorer = _Restorer(db, batch_size)
+    for record in iter_records(lines):
+        kind = record.get("type")
+        if kind == "meta":
+            if record.get("version", SNAPSHOT_VERSION) > SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported snapshot version {record['version']}")
+        elif kind == "user":
+            if db.get(models.User, record["id"]) is None:
+                db.add(models.User(
+                    id=record["id"],
+                    email=record["email"],
+                    name=record["name"],
+                    preferences=record.get("preferences") or {}
+                ))
+                db.commit()
+        elif kind == "note":
+            await restorer.add_note(record)
+        elif kind == "connection":
+            await restorer.add_connection(record)
+    await restorer.flush_notes()
+    restorer.flush_connections()
+
+    _sync_sequences(db)
+    return restorer.report
@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+from app.db import models
+
+MAX_TAG_LENGTH = 100
+
+def normalize_tag(tag: str) -> str:
+    """검색용 태그 정규화 (공백 정리 + 대소문자 무시)"""
+    return " ".join(str(tag).split()).casefold()[:MAX_TAG_LENGTH]
+
+def normalize_tags(tags: Optional[Sequence[str]]) -> List[str]:
+    """정규화 + 중복 제거 (순서 유지)"""
+    result: Dict[str, None] = {}
+    for tag in tags or []:
+        normalized = normalize_tag(tag)
+        if normalized:
+            result.setdefault(normalized, None)
+    return list(result)
+
+def set_note_tags(note: models.Note, tags: List[str]) -> bool:
+    """노트 태그 저장 + 태그 인덱스 동기화 (커밋하지 않음)
+
+    Note.tags는 표시용으로 원본을 유지하고, note_tags에는 정규화된 값만 넣는다.
+    바뀐 태그만 추가/삭제한다. 반환: 정규화된 태그 집합이 바뀌었는지
+    """
+    note.tags = tags
+    wanted = normalize_tags(tags)
+    existing = {row.tag: row for row in note.tag_index}
+    for tag, row in existing.items():
+        if tag not in wanted:
+            note.tag_index.remove(row)
+    for tag in wanted:
+        if tag not in existing:
+            note.tag_index.append(models.NoteTag(user_id=note.user_id, tag=tag))
+    return set(wanted) != set(existing)
+
+def notes_with_tags(db: Session, user_id: int, tags: Sequence[str]) -> Query:
+    """모든 태그를 가진 노트 ID 쿼리 (서브쿼리로 사용)"""
+    wanted = normalize_tags(tags)
+    query = db.query(models.NoteTag.note_id)\
+        .filter(models.NoteTag.user_id == user_id)\
+        .filter(models.NoteTag.tag.in_(wanted))\
+        .group_by(models.NoteTag.note_id)
+    if len(wanted) > 1:
+        query = query.having(func.count(models.NoteTag.tag) == len(wanted))
+    return query
+
+def tag_facets(
+    db: Session,
+    user_id: int,
+    tags: Optional[Sequence[str]] = None,
+    limit: int = 50
+) -> List[Dict[str, object]]:
+    """태그별 노트 수 (tags가 있으면 그 태그를 모두 가진 노트 안에서 집계)"""
+    query = db.query(models.NoteTag.tag, func.count(models.NoteTag.note_id).label("count"))\
+        .filter(models.NoteTag.user_id == user_id)
+    selected = normalize_tags(tags)
+    if selected:
+        query = query\
+            .filter(models.NoteTag.note_id.in_(notes_with_tags(db, user_id, selected)))\
+            .filter(models.NoteTag.tag.notin_(selected))
+    rows = query\
+        .group_by(models.NoteTag.tag)\
+        .order_by(func.count(models.NoteTag.note_id).desc(), models.NoteTag.tag)\
+        .limit(limit)\
+        .all()
+    return [{"tag": tag, "count": count} for tag, count in rows]
+
+def rebuild_tag_index(db: Session, batch_size: int = 500) -> int:
+    """기존 노트의 Note.tags로 태그 인덱스 재구성 (도입 이전 데이터 이관용)
+
+    반환: 처리한 노트 수
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        notes = db.query(models.Note)\
+            .filter(models.Note.id > last_id)\
+            .order_by(models.Note.id)\
+            .limit(batch_size)\
+            .all()
+        if not notes:
+            break
+        for note in notes:
+            set_note_tags(note, list(note.tags or []))
+        db.commit()
+        processed += len(notes)
+        last_id = notes[-1].id
+    return processed
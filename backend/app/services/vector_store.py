@@ -1,16 +1,35 @@
+import asyncio
 import weaviate
 from weaviate.auth import AuthApiKey
-from typing import List, Tuple, Optional
-import os
+from weaviate.classes.config import Configure, DataType, Property, Tokenization
+from weaviate.classes.data import DataObject
+from weaviate.classes.query import Filter, MetadataQuery, Sort
+from weaviate.util import generate_uuid5
+from typing import Dict, List, Tuple, Optional
 from app.core.config import settings
+from app.services.chunking import Chunk, aggregate_chunk_hits, mean_vector
+from app.services.local_index import LocalVectorIndex
+
+# 청크 벡터 조회: 노트 묶음마다 offset 페이지로 가져옴
+# (offset + limit는 Weaviate QUERY_MAXIMUM_RESULTS(기본 10000)를 넘을 수 없음 - 최대 길이 노트 ~40청크 x 50)
+CHUNK_FETCH_NOTES = 50
+CHUNK_FETCH_PAGE = 500
 
 class VectorStore:
     def __init__(self):
         self.client = None
-        self.collection_name = "NoteVector"
-        
+        self.local = None  # Weaviate 대신 사용하는 로컬 인덱스
+        self._ivf_task: Optional[asyncio.Task] = None
+        # 노트 전체가 아니라 청크 단위로 벡터를 저장
+        self.collection_name = "NoteChunk"
+        self.legacy_collection_name = "NoteVector"  # 노트당 벡터 1개였던 이전 컬렉션
+
     def connect(self):
         """Weaviate 클라우드 연결"""
+        if settings.VECTOR_BACKEND == "local":
+            self._use_local_index()
+            return True
+
         try:
             if settings.WEAVIATE_API_KEY:
                 # Weaviate Cloud 사용
@@ -24,140 +43,372 @@ class VectorStore:
                     host=settings.WEAVIATE_URL.replace("http://", "").replace(":8080", ""),
                     port=8080
                 )
-            
+
             self._ensure_collection()
             return True
         except Exception as e:
             print(f"Weaviate connection error: {e}")
-            # Fallback to in-memory storage
+            # Fallback to local index
+            self._use_local_index()
             return False
-    
+
+    def _use_local_index(self):
+        """로컬 NumPy 인덱스 사용 (다른 프로세스가 사용 중이면 IndexLockedError)"""
+        self.local = LocalVectorIndex(settings.LOCAL_INDEX_DIR).load()
+        print(f"Using local vector index: {settings.LOCAL_INDEX_DIR} ({len(self.local)} chunks)")
+
+    def _schedule_ivf_training(self):
+        """로컬 인덱스 IVF 학습을 스레드에서 실행 (끝날 때까지 기존 리스트로 검색)"""
+        if not self.local.ivf_training_due():
+            return
+        if self._ivf_task is not None and not self._ivf_task.done():
+            return
+        self._ivf_task = asyncio.create_task(self._train_ivf())
+
+    async def _train_ivf(self):
+        try:
+            built = await asyncio.to_thread(self.local.build_ivf)
+            if not self.local.install_ivf(built):
+                # 학습 중 압축으로 행 번호가 바뀜 -> 다음 쓰기 때 다시 학습
+                print("IVF training discarded (index compacted during training)")
+        except Exception as e:
+            print(f"IVF training error: {e}")
+
+    @staticmethod
+    def _tags_property() -> Property:
+        # 태그 전체 값으로 일치 검사 (단어 단위로 나누지 않음)
+        return Property(name="tags", data_type=DataType.TEXT_ARRAY, tokenization=Tokenization.FIELD)
+
     def _ensure_collection(self):
-        """컬렉션 생성 (이미 있으면 스킵)"""
+        """컬렉션 생성 (이미 있으면 새로 추가된 속성만 보강)"""
         try:
-            collections = self.client.collections.list_all()
-            if self.collection_name not in [c.name for c in collections]:
+            if self.client.collections.exists(self.collection_name):
+                collection = self.client.collections.get(self.collection_name)
+                if "tags" not in {p.name for p in collection.config.get().properties}:
+                    collection.config.add_property(self._tags_property())
+                    print(f"Added tags property to {self.collection_name} (run python -m app.cli rebuild-tags to backfill)")
+            else:
                 self.client.collections.create(
                     name=self.collection_name,
+                    vectorizer_config=Configure.Vectorizer.none(),
                     properties=[
-                        {"name": "note_id", "dataType": ["int"]},
-                        {"name": "user_id", "dataType": ["int"]},  
-                        {"name": "title", "dataType": ["text"]},
-                        {"name": "content", "dataType": ["text"]},
-                        {"name": "summary", "dataType": ["text"]},
+                        Property(name="note_id", data_type=DataType.INT),
+                        Property(name="user_id", data_type=DataType.INT),
+                        Property(name="chunk_index", data_type=DataType.INT),
+                        Property(name="chunk_hash", data_type=DataType.TEXT),
+                        Property(name="title", data_type=DataType.TEXT),
+                        Property(name="content", data_type=DataType.TEXT),
+                        self._tags_property(),
                     ]
                 )
                 print(f"Created collection: {self.collection_name}")
         except Exception as e:
             print(f"Collection creation error (may already exist): {e}")
-    
+
+    def drop_legacy_collection(self) -> bool:
+        """이전 NoteVector 컬렉션 삭제 (노트 전체 벡터라 청크로 옮길 수 없음)"""
+        if not self.client:
+            return False
+        try:
+            if self.client.collections.exists(self.legacy_collection_name):
+                self.client.collections.delete(self.legacy_collection_name)
+                print(f"Deleted legacy collection: {self.legacy_collection_name}")
+            return True
+        except Exception as e:
+            print(f"Legacy collection delete error: {e}")
+            return False
+
     def close(self):
         """연결 종료"""
         if self.client:
             self.client.close()
-    
-    async def upsert_vector(
-        self, 
-        note_id: int, 
+        if self.local is not None:
+            self.local.close()
+
+    @staticmethod
+    def _chunk_uuid(note_id: int, chunk_hash: str) -> str:
+        """노트 ID + 청크 해시로 결정적 UUID 생성 (재시도해도 중복 없음)"""
+        return generate_uuid5(f"{note_id}:{chunk_hash}")
+
+    async def upsert_chunks(
+        self,
+        note_id: int,
         user_id: int,
-        title: str, 
-        content: str,
-        summary: str,
-        vector: List[float]
-    ) -> Optional[str]:
-        """벡터 저장/업데이트"""
+        chunks: List[Tuple[Chunk, List[float]]],
+        tags: Optional[List[str]] = None
+    ) -> bool:
+        """청크 벡터 저장/업데이트 (tags: 청크마다 저장할 정규화된 노트 태그)"""
+        if self.local is not None:
+            self.local.add([
+                (note_id, user_id, chunk.hash, chunk.title, chunk.text, vector)
+                for chunk, vector in chunks
+            ], tags or [])
+            self._schedule_ivf_training()
+            return True
         if not self.client:
-            return None
-            
+            return False
+
         try:
             collection = self.client.collections.get(self.collection_name)
-            
-            # 기존 노트 삭제
+            uuids = [self._chunk_uuid(note_id, chunk.hash) for chunk, _ in chunks]
+
+            # 같은 UUID가 남아 있으면 insert가 실패하므로 먼저 삭제
             collection.data.delete_many(
-                where=collection.filter.by_property("note_id").equal(note_id)
+                where=Filter.by_id().contains_any(uuids)
             )
-            
-            # 새 데이터 삽입
-            uuid_obj = collection.data.insert(
-                properties={
-                    "note_id": note_id,
-                    "user_id": user_id,
-                    "title": title,
-                    "content": content[:1000],
-                    "summary": summary or ""
-                },
-                vector=vector
+
+            result = collection.data.insert_many([
+                DataObject(
+                    properties={
+                        "note_id": note_id,
+                        "user_id": user_id,
+                        "chunk_index": chunk.index,
+                        "chunk_hash": chunk.hash,
+                        "title": chunk.title,
+                        "content": chunk.text,
+                        "tags": tags or [],
+                    },
+                    vector=vector,
+                    uuid=uuid,
+                )
+                for (chunk, vector), uuid in zip(chunks, uuids)
+            ])
+            if result.has_errors:
+                print(f"Chunk upsert errors: {result.errors}")
+                return False
+            return True
+
+        except Exception as e:
+            print(f"Chunk upsert error: {e}")
+            return False
+
+    async def set_note_tags(self, note_id: int, tags: List[str]) -> bool:
+        """노트의 모든 청크에 저장된 태그 교체 (임베딩은 그대로)"""
+        if self.local is not None:
+            self.local.set_note_tags(note_id, tags)
+            return True
+        if not self.client:
+            return False
+
+        try:
+            collection = self.client.collections.get(self.collection_name)
+            results = collection.query.fetch_objects(
+                filters=Filter.by_property("note_id").equal(note_id),
+                return_properties=[],
+                limit=1000
             )
-            
-            return str(uuid_obj)
-            
+            for obj in results.objects:
+                collection.data.update(uuid=obj.uuid, properties={"tags": tags})
+            return True
         except Exception as e:
-            print(f"Vector upsert error: {e}")
-            return None
-    
+            print(f"Set chunk tags error: {e}")
+            return False
+
+    async def delete_chunks(self, note_id: int, chunk_hashes: List[str]) -> bool:
+        """노트의 특정 청크 벡터 삭제"""
+        if not chunk_hashes:
+            return False
+        if self.local is not None:
+            self.local.remove_keys([(note_id, h) for h in chunk_hashes])
+            return True
+        if not self.client:
+            return False
+
+        try:
+            collection = self.client.collections.get(self.collection_name)
+            collection.data.delete_many(
+                where=Filter.by_id().contains_any(
+                    [self._chunk_uuid(note_id, h) for h in chunk_hashes]
+                )
+            )
+            return True
+        except Exception as e:
+            print(f"Delete chunk error: {e}")
+            return False
+
     async def search_similar(
-        self, 
-        vector: List[float], 
+        self,
+        vector: List[float],
         user_id: Optional[int] = None,
         limit: int = 5,
-        min_score: float = 0.7
+        min_score: float = 0.7,
+        note_ids: Optional[List[int]] = None,
+        tags: Optional[List[str]] = None
     ) -> List[Tuple[int, str, str, float]]:
-        """유사한 노트 검색"""
+        """유사한 노트 검색
+
+        청크 단위로 검색한 뒤 노트 단위로 점수를 합산한다 (CHUNK_POOLING).
+        note_ids가 주어지면 그 노트들 안에서만 검색한다.
+        tags가 주어지면 청크에 저장된 태그로 사전 필터링한다 (정규화된 태그, 모두 일치).
+        반환: (note_id, title, 가장 유사한 청크 내용, score)
+        """
+        if note_ids is not None and not note_ids:
+            return []
+        if self.local is not None:
+            hits = self.local.search(
+                vector, user_id, k=limit * settings.CHUNK_SEARCH_FANOUT, note_ids=note_ids, tags=tags
+            )
+            return aggregate_chunk_hits(hits, limit, min_score)
         if not self.client:
             return []
-            
+
         try:
             collection = self.client.collections.get(self.collection_name)
-            
-            # 벡터 유사도 검색
-            query = collection.query.near_vector(
+
+            # 벡터 유사도 검색 (사용자/노트 필터링 포함)
+            conditions = []
+            if user_id:
+                conditions.append(Filter.by_property("user_id").equal(user_id))
+            if note_ids is not None:
+                conditions.append(Filter.by_property("note_id").contains_any(note_ids))
+            if tags:
+                conditions.append(Filter.by_property("tags").contains_all(list(tags)))
+            results = collection.query.near_vector(
                 near_vector=vector,
-                limit=limit * 2,
-                return_metadata=["distance"]
+                limit=limit * settings.CHUNK_SEARCH_FANOUT,
+                filters=Filter.all_of(conditions) if conditions else None,
+                return_metadata=MetadataQuery(distance=True)
             )
-            
-            # 사용자 필터링
-            if user_id:
-                query = query.where(
-                    collection.filter.by_property("user_id").equal(user_id)
+
+            hits = [
+                (
+                    obj.properties["note_id"],
+                    obj.properties["title"],
+                    obj.properties.get("content", ""),
+                    1 - (obj.metadata.distance or 0)
                 )
-            
-            results = query.do()
-            
-            # 결과 정리
-            similar_notes = []
-            for obj in results.objects:
-                similarity = 1 - (obj.metadata.distance or 0)
-                
-                if similarity >= min_score:
-                    similar_notes.append((
-                        obj.properties["note_id"],
-                        obj.properties["title"],
-                        obj.properties.get("summary", ""),
-                        similarity
-                    ))
-            
-            similar_notes.sort(key=lambda x: x[3], reverse=True)
-            return similar_notes[:limit]
-            
+                for obj in results.objects
+            ]
+            return aggregate_chunk_hits(hits, limit, min_score)
+
         except Exception as e:
             print(f"Similar search error: {e}")
             return []
-    
+
+    async def get_note_vector(self, note_id: int) -> Optional[List[float]]:
+        """노트 대표 벡터 (청크 벡터 평균)"""
+        if self.local is not None:
+            vectors = self.local.note_vectors(note_id)
+            return vectors.mean(axis=0).tolist() if len(vectors) else None
+        if not self.client:
+            return None
+
+        try:
+            collection = self.client.collections.get(self.collection_name)
+            results = collection.query.fetch_objects(
+                filters=Filter.by_property("note_id").equal(note_id),
+                include_vector=True,
+                limit=1000
+            )
+            vectors = []
+            for obj in results.objects:
+                vector = obj.vector
+                if isinstance(vector, dict):
+                    vector = vector.get("default")
+                if vector:
+                    vectors.append(vector)
+            return mean_vector(vectors) or None
+        except Exception as e:
+            print(f"Get note vector error: {e}")
+            return None
+
     async def delete_note_vector(self, note_id: int) -> bool:
-        """노트 벡터 삭제"""
+        """노트의 모든 청크 벡터 삭제"""
+        if self.local is not None:
+            self.local.remove_note(note_id)
+            return True
         if not self.client:
             return False
-            
+
         try:
             collection = self.client.collections.get(self.collection_name)
             collection.data.delete_many(
-                where=collection.filter.by_property("note_id").equal(note_id)
+                where=Filter.by_property("note_id").equal(note_id)
             )
             return True
         except Exception as e:
             print(f"Delete vector error: {e}")
             return False
 
+    async def delete_notes_vectors(self, note_ids: List[int]) -> bool:
+        """여러 노트의 청크 벡터를 한 번에 삭제"""
+        if not note_ids:
+            return True
+        if self.local is not None:
+            for note_id in note_ids:
+                self.local.remove_note(note_id)
+            return True
+        if not self.client:
+            return False
+
+        try:
+            collection = self.client.collections.get(self.collection_name)
+            collection.data.delete_many(
+                where=Filter.by_property("note_id").contains_any(note_ids)
+            )
+            return True
+        except Exception as e:
+            print(f"Bulk delete vector error: {e}")
+            return False
+
+    async def get_chunk_vectors(self, note_ids: List[int]) -> Dict[int, Dict[str, List[float]]]:
+        """노트별 {청크 해시: 벡터} (실패 시 빈 dict - 일부만 가져온 결과는 반환하지 않음)"""
+        if not note_ids:
+            return {}
+        if self.local is not None:
+            return {
+                nid: {chunk_hash: vector.tolist() for chunk_hash, vector in vectors.items()}
+                for nid, vectors in self.local.chunk_vectors(note_ids).items()
+            }
+        if not self.client:
+            return {}
+
+        try:
+            collection = self.client.collections.get(self.collection_name)
+            chunk_vectors: Dict[int, Dict[str, List[float]]] = {}
+            for start in range(0, len(note_ids), CHUNK_FETCH_NOTES):
+                group = note_ids[start:start + CHUNK_FETCH_NOTES]
+                offset = 0
+                while True:
+                    # ID 순으로 정렬해야 페이지 사이에 빠지거나 겹치는 객체가 없음
+                    results = collection.query.fetch_objects(
+                        filters=Filter.by_property("note_id").contains_any(group),
+                        sort=Sort.by_id(),
+                        include_vector=True,
+                        return_properties=["note_id", "chunk_hash"],
+                        limit=CHUNK_FETCH_PAGE,
+                        offset=offset
+                    )
+                    for obj in results.objects:
+                        vector = obj.vector
+                        if isinstance(vector, dict):
+                            vector = vector.get("default")
+                        if vector:
+                            chunk_vectors.setdefault(obj.properties["note_id"], {})[obj.properties["chunk_hash"]] = vector
+                    if len(results.objects) < CHUNK_FETCH_PAGE:
+                        break
+                    offset += CHUNK_FETCH_PAGE
+            return chunk_vectors
+        except Exception as e:
+            print(f"Get chunk vectors error: {e}")
+            return {}
+
+    async def list_chunk_keys(self) -> Optional[List[Tuple[int, str]]]:
+        """저장된 모든 (note_id, chunk_hash) 목록 (정합성 검사용, 실패 시 None)"""
+        if self.local is not None:
+            return self.local.keys()
+        if not self.client:
+            return None
+
+        try:
+            collection = self.client.collections.get(self.collection_name)
+            return [
+                (obj.properties["note_id"], obj.properties["chunk_hash"])
+                for obj in collection.iterator(return_properties=["note_id", "chunk_hash"])
+            ]
+        except Exception as e:
+            print(f"List chunk keys error: {e}")
+            return None
+
 # 싱글톤 인스턴스
 vector_store = VectorStore()
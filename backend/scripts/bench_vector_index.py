@@ -0,0 +1,102 @@
+"""로컬 벡터 인덱스 벤치마크 (메모리 / recall@k / 지연시간, 양자화 및 IVF)
+
+사용법 (backend 디렉토리에서):
+    python -m scripts.bench_vector_index --vectors 20000 --queries 200
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from app.services.local_index import LocalVectorIndex
+from app.services.quantization import normalize
+
+def make_dataset(count: int, dimensions: int, clusters: int, seed: int = 0):
+    """클러스터 구조가 있는 합성 임베딩 생성
+
+    Matryoshka 학습된 임베딩처럼 앞쪽 차원에 분산이 몰리도록 차원별 스케일을 감소시킨다.
+    """
+    rng = np.random.default_rng(0)
+    spectrum = 1.0 / np.sqrt(1.0 + np.arange(dimensions) / 32.0)
+    centers = rng.normal(size=(clusters, dimensions)) * spectrum
+    rng = np.random.default_rng(seed + 1)
+    labels = rng.integers(0, clusters, size=count)
+    data = centers[labels] + 0.5 * rng.normal(size=(count, dimensions)) * spectrum
+    return normalize(data)
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ data.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def run(config: dict, data: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    with tempfile.TemporaryDirectory() as path:
+        tracemalloc.start()
+        index = LocalVectorIndex(path, **config)
+        start = time.perf_counter()
+        for offset in range(0, len(data), 2000):
+            block = data[offset:offset + 2000]
+            index.add([
+                (offset + i, 1, str(offset + i), "", "", vector)
+                for i, vector in enumerate(block)
+            ])
+        if index.ivf_training_due():
+            index.train_ivf()
+        build_seconds = time.perf_counter() - start
+        # 실제로 힙에 남은 크기 (memory_bytes 추정치 검증용)
+        heap_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        hits = 0
+        latencies = []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            found = index.search(query, user_id=1, k=k)
+            latencies.append(time.perf_counter() - start)
+            hits += len({note_id for note_id, _, _, _ in found} & set(expected.tolist()))
+
+        return {
+            "memory_mb": index.memory_bytes() / 2**20,
+            "heap_mb": heap_bytes / 2**20,
+            "recall": hits / (len(queries) * k),
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "build_s": build_seconds,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF 탐색 리스트 수 (기본: LOCAL_INDEX_IVF_NPROBE)")
+    parser.add_argument("--rerank", type=int, default=None, help="재채점 후보 배율 (기본: LOCAL_INDEX_RERANK)")
+    args = parser.parse_args()
+
+    data = make_dataset(args.vectors, args.dimensions, clusters=max(args.vectors // 200, 8))
+    queries = make_dataset(args.queries, args.dimensions, clusters=max(args.vectors // 200, 8), seed=1)
+    truth = exact_top_k(data, queries, args.k)
+    baseline_mb = data.nbytes / 2**20
+
+    ivf = {"ann": "ivf", "ann_min_rows": 0, "nprobe": args.nprobe}
+    configs = [
+        ("float32", {"quantization": "none", "dimensions": 0, "ann": "none"}),
+        ("int8", {"quantization": "int8", "dimensions": 0, "ann": "none"}),
+        ("int8 + 512d", {"quantization": "int8", "dimensions": 512, "ann": "none"}),
+        ("pq64", {"quantization": "pq", "dimensions": 0, "pq_subvectors": 64, "ann": "none"}),
+        ("pq32 + 512d", {"quantization": "pq", "dimensions": 512, "pq_subvectors": 32, "ann": "none"}),
+        ("ivf float32", {"quantization": "none", "dimensions": 0, **ivf}),
+        ("ivf int8+512d", {"quantization": "int8", "dimensions": 512, **ivf}),
+    ]
+
+    print(f"{args.vectors} vectors x {args.dimensions}d, float32 = {baseline_mb:.1f} MB")
+    print(f"{'mode':<14}{'RAM MB':>10}{'heap MB':>9}{'saving':>9}{'recall@' + str(args.k):>11}{'p50 ms':>9}{'p95 ms':>9}{'build s':>9}")
+    for name, config in configs:
+        result = run(dict(config, rerank=args.rerank), data, queries, truth, args.k)
+        print(
+            f"{name:<14}{result['memory_mb']:>10.1f}{result['heap_mb']:>9.1f}{baseline_mb / result['memory_mb']:>8.1f}x"
+            f"{result['recall']:>11.3f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['build_s']:>9.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""테스트 공통 설정
+
+설정은 import 시점에 환경변수에서 읽으므로 app을 import하기 전에 임시 SQLite DB,
+로컬 벡터 인덱스, BATCH_DIR을 지정한다 (OpenAI API나 실제 DB를 건드리지 않음).
+"""
+import os
+import shutil
+import tempfile
+import pytest
+
+WORK_DIR = tempfile.mkdtemp(prefix="brainsxlm-test-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(WORK_DIR, 'test.db')}",
+    VECTOR_BACKEND="local",
+    LOCAL_INDEX_DIR=os.path.join(WORK_DIR, "vector_index"),
+    BATCH_DIR=os.path.join(WORK_DIR, "batches"),
+    OPENAI_API_KEY="test",
+)
+
+from app.core.config import settings  # noqa: E402
+from app.db.session import Base, engine  # noqa: E402
+from app.services.vector_store import vector_store  # noqa: E402
+
+@pytest.fixture
+def store():
+    """빈 DB + 빈 로컬 벡터 인덱스 (테스트가 끝나면 인덱스 잠금 해제)"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    shutil.rmtree(settings.LOCAL_INDEX_DIR, ignore_errors=True)
+    vector_store.connect()
+    yield vector_store
+    vector_store.close()
+    vector_store.local = None
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,108 @@
+"""배치 작업: LocalBatchTransport로 내보내기 -> 제출 -> 조회 -> 적용"""
+import asyncio
+from typing import Any, Dict, List
+from app.db import models
+from app.db.session import SessionLocal
+from app.services import batch_jobs
+from app.services.chunking import build_chunks
+from app.services.enrichment import stamp_hashes
+from app.services.query_cache import similarity_cache
+
+USER_ID = 1
+NOTES = [
+    ("사과 재배", "사과 나무는 봄에 꽃이 핀다. 가을에 사과를 수확한다.\n\n" + "과수원 관리 일지. " * 200),
+    ("로켓 발사", "로켓은 궤도에 오르기 위해 여러 단으로 나뉜다."),
+    ("커피 추출", "원두를 갈아 물을 통과시키면 커피가 추출된다. 온도와 시간이 맛을 좌우한다."),
+]
+
+def add_notes() -> List[int]:
+    with SessionLocal() as db:
+        notes = [
+            models.Note(user_id=USER_ID, title=title, content=content, summary=batch_jobs.SUMMARY_FAILED, tags=[])
+            for title, content in NOTES
+        ]
+        for note in notes:
+            stamp_hashes(note)
+        db.add_all(notes)
+        db.commit()
+        return [note.id for note in notes]
+
+def export(kind: str) -> Dict[str, Any]:
+    with SessionLocal() as db:
+        return batch_jobs.export_job(db, kind)
+
+def run_job(manifest: Dict[str, Any]) -> Dict[str, int]:
+    """제출 -> 조회 -> 적용. 반환: 적용 결과"""
+    async def run():
+        await batch_jobs.submit_job(manifest["id"], batch_jobs.LocalBatchTransport.name)
+        polled = await batch_jobs.poll_job(manifest["id"])
+        assert batch_jobs.is_finished(polled)
+        with SessionLocal() as db:
+            return await batch_jobs.apply_job(db, manifest["id"])
+    return asyncio.run(run())
+
+def edit_note(note_id: int, content: str) -> None:
+    with SessionLocal() as db:
+        note = db.get(models.Note, note_id)
+        note.content = content
+        stamp_hashes(note)
+        db.commit()
+
+def test_summarize_job_applies_summaries_and_bumps_cache(store):
+    add_notes()
+    manifest = export(batch_jobs.SUMMARIZE)
+    assert manifest["notes"] == len(NOTES) and manifest["requests"] == len(NOTES)
+
+    generation = similarity_cache.generation(USER_ID)
+    report = run_job(manifest)
+    assert report == {"applied": len(NOTES), "stale": 0, "failed": 0}
+    # 캐시된 유사 노트 결과의 요약/태그가 바뀌었으므로 무효화
+    assert similarity_cache.generation(USER_ID) > generation
+
+    with SessionLocal() as db:
+        notes = db.query(models.Note).all()
+        assert all(note.summary != batch_jobs.SUMMARY_FAILED and note.tag_index for note in notes)
+        # 태그가 바뀐 노트는 청크 태그 갱신 작업이 기록됨
+        queued = {entry.note_id for entry in db.query(models.VectorOutbox).all()}
+        assert queued == {note.id for note in notes}
+    assert export(batch_jobs.SUMMARIZE)["requests"] == 0
+
+def test_summarize_job_skips_notes_changed_after_export(store):
+    note_ids = add_notes()
+    manifest = export(batch_jobs.SUMMARIZE)
+    edit_note(note_ids[1], "로켓 엔진은 연료를 태워 추력을 만든다.")
+
+    report = run_job(manifest)
+    assert report == {"applied": len(NOTES) - 1, "stale": 1, "failed": 0}
+    with SessionLocal() as db:
+        assert db.get(models.Note, note_ids[1]).summary == batch_jobs.SUMMARY_FAILED
+        assert db.get(models.Note, note_ids[0]).summary != batch_jobs.SUMMARY_FAILED
+    # 건너뛴 노트만 다시 내보냄
+    assert export(batch_jobs.SUMMARIZE)["notes"] == 1
+
+def test_embed_job_indexes_chunks_without_api(store):
+    add_notes()
+    manifest = export(batch_jobs.EMBED)
+    report = run_job(manifest)
+    assert report == {"applied": len(NOTES), "stale": 0, "failed": 0}
+
+    with SessionLocal() as db:
+        notes = db.query(models.Note).all()
+        expected = sum(len(build_chunks(note.title, note.content)) for note in notes)
+        assert sum(len(note.chunks) for note in notes) == expected == len(store.local)
+    assert export(batch_jobs.EMBED)["requests"] == 0
+
+    query = batch_jobs.LocalBatchTransport()._embed("로켓 궤도")
+    hits = asyncio.run(store.search_similar(query, USER_ID, limit=1, min_score=0.0))
+    assert hits and hits[0][1] == "로켓 발사"
+
+def test_embed_job_skips_notes_changed_after_export(store):
+    note_ids = add_notes()
+    manifest = export(batch_jobs.EMBED)
+    edit_note(note_ids[2], "차는 잎을 우려서 마신다.")
+
+    report = run_job(manifest)
+    assert report == {"applied": len(NOTES) - 1, "stale": 1, "failed": 0}
+    with SessionLocal() as db:
+        assert not db.get(models.Note, note_ids[2]).chunks
+    assert store.local.note_vectors(note_ids[2]).shape[0] == 0
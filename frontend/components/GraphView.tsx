@@ -10,6 +10,8 @@ interface GraphViewProps {
       label: string;
       group?: string;
       size?: number;
+      x?: number | null;
+      y?: number | null;
     }>;
     edges: Array<{
       source: string;
@@ -47,14 +49,22 @@ export default function GraphView({ data, onNodeClick, height = 600 }: GraphView
       .domain([0.8, 2])
       .range([8, 20]);
 
+    // 서버에서 계산한 좌표(0~1)가 있으면 초기 위치로 사용하고 시뮬레이션은 미세 조정만
+    const hasLayout = data.nodes.length > 0 &&
+      data.nodes.every((n) => n.x != null && n.y != null);
+    const nodes = hasLayout
+      ? data.nodes.map((n) => ({ ...n, x: (n.x as number) * width, y: (n.y as number) * heightValue }))
+      : data.nodes;
+
     // 시뮬레이션 설정
-    const simulation = d3.forceSimulation(data.nodes as any)
+    const simulation = d3.forceSimulation(nodes as any)
       .force('link', d3.forceLink(data.edges as any)
         .id((d: any) => d.id)
         .distance((d: any) => 150 * (1 - d.weight)))
       .force('charge', d3.forceManyBody().strength(-300))
       .force('center', d3.forceCenter(width / 2, heightValue / 2))
-      .force('collision', d3.forceCollide().radius((d: any) => sizeScale(d.size || 1) + 5));
+      .force('collision', d3.forceCollide().radius((d: any) => sizeScale(d.size || 1) + 5))
+      .alpha(hasLayout ? 0.05 : 1);
 
     // 화살표 마커 정의
     svg.append('defs').selectAll('marker')
@@ -99,7 +109,7 @@ export default function GraphView({ data, onNodeClick, height = 600 }: GraphView
     const nodeGroup = g.append('g')
       .attr('class', 'nodes')
       .selectAll('g')
-      .data(data.nodes)
+      .data(nodes)
       .enter().append('g')
       .attr('class', 'graph-node')
       .call(d3.drag()
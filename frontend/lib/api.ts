@@ -66,6 +66,12 @@ api.interceptors.response.use(
       return Promise.reject(error);
     }
     
+    // 503 Service Unavailable (서버 과부하로 요청 거절)
+    if (error.response.status === 503) {
+      toast.error('요청이 많아 처리가 지연되고 있습니다. 잠시 후 다시 시도해주세요.');
+      return Promise.reject(error);
+    }
+    
     // 500 Server Error
     if (error.response.status >= 500) {
       toast.error('서버 오류가 발생했습니다. 잠시 후 다시 시도해주세요.');
@@ -103,12 +109,19 @@ interface SimilarNote {
   tags?: string[];
 }
 
+interface TagFacet {
+  tag: string;
+  count: number;
+}
+
 interface GraphData {
   nodes: Array<{
     id: string;
     label: string;
     group?: string;
     size?: number;
+    x?: number | null;
+    y?: number | null;
   }>;
   edges: Array<{
     source: string;
@@ -132,9 +145,19 @@ export const noteApi = {
   },
 
   // 노트 목록
-  list: async (skip = 0, limit = 20): Promise<Note[]> => {
+  list: async (skip = 0, limit = 20, tags: string[] = []): Promise<Note[]> => {
     const response = await api.get('/api/notes/list', {
-      params: { skip, limit },
+      params: { skip, limit, tag: tags },
+      paramsSerializer: { indexes: null },  // tag=a&tag=b
+    });
+    return response.data;
+  },
+
+  // 태그별 노트 수
+  tagFacets: async (tags: string[] = [], limit = 50): Promise<TagFacet[]> => {
+    const response = await api.get('/api/notes/tags/facets', {
+      params: { tag: tags, limit },
+      paramsSerializer: { indexes: null },
     });
     return response.data;
   },
@@ -163,9 +186,10 @@ export const noteApi = {
   },
 
   // 유사 노트 검색
-  findSimilar: async (query: string, limit = 5): Promise<{ similar_notes: SimilarNote[] }> => {
+  findSimilar: async (query: string, limit = 5, tags: string[] = []): Promise<{ similar_notes: SimilarNote[] }> => {
     const response = await api.post('/api/notes/similar', null, {
-      params: { query, limit },
+      params: { query, limit, tag: tags },
+      paramsSerializer: { indexes: null },
     });
     return response.data;
   },